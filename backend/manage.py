@@ -0,0 +1,70 @@
+"""Maintenance commands for the Student Result API.
+
+Run from the backend directory, with the same environment as the server:
+
+    python manage.py rebuild-summaries
+    python manage.py rebuild-summaries --student-id ST001
+    python manage.py archive-year 2022
+    python manage.py dedupe-results
+"""
+import asyncio
+from typing import Optional
+
+import typer
+
+import server
+
+cli = typer.Typer(help="Student Result API maintenance commands")
+
+
+async def with_database(operation):
+    await server.connect_to_mongo()
+    try:
+        await server.create_indexes()
+        # Summaries and archives are computed with the active grading scale
+        await server.grading_scales.refresh()
+        return await operation()
+    finally:
+        await server.close_mongo_connection()
+
+
+@cli.command("rebuild-summaries")
+def rebuild_summaries(
+    student_id: Optional[str] = typer.Option(None, help="Only rebuild this student's summary"),
+    chunk_size: int = typer.Option(1000, help="Summaries written per bulk_write batch"),
+):
+    """Recompute student GPA summaries from the results collection"""
+    student_ids = [student_id] if student_id else None
+    written = asyncio.run(with_database(lambda: server.rebuild_student_summaries(student_ids, chunk_size)))
+    typer.echo(f"Rebuilt {written} student summaries")
+
+
+@cli.command("archive-year")
+def archive_year(
+    year: str = typer.Argument(..., help="Closed academic year to archive, e.g. 2022"),
+    chunk_size: int = typer.Option(500, help="Students archived per batch"),
+):
+    """Move a closed year's results into immutable per-student snapshots.
+    The year becomes read-only; re-running resumes an interrupted archive."""
+    report = asyncio.run(with_database(lambda: server.archive_year(year, chunk_size)))
+    typer.echo(f"Archived {report['results']} results for {report['students']} students from {report['year']}")
+
+
+@cli.command("dedupe-results")
+def dedupe_results(
+    chunk_size: int = typer.Option(1000, help="Results deleted per batch"),
+):
+    """Keep the newest result per student, subject, semester and year, delete
+    the rest, then build the unique index that keeps them from coming back"""
+    async def dedupe():
+        report = await server.dedupe_results(chunk_size)
+        await server.create_indexes()
+        return report
+
+    report = asyncio.run(with_database(dedupe))
+    typer.echo(f"Removed {report['removed']} duplicate results for {report['keys']} keys "
+               f"({report['students']} students)")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,23 +1,118 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import Match
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, ReplaceOne, UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError, BulkWriteError, OperationFailure, PyMongoError
+from pydantic import BaseModel, ValidationError
 from typing import Optional, List
 import pymongo
 import os
 import uuid
 import bcrypt
 import jwt
+import hmac
 from datetime import datetime, timedelta
 import json
+import zlib
+import orjson
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+import asyncio
+import time
+import logging
+import contextvars
+from collections import OrderedDict
+import csv
+import io
+import re
+import base64
+import bisect
+import itertools
+import numpy as np
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; responses fall back to gzip
+    brotli = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet exports are unavailable without pyarrow
+    pyarrow = None
 
 # Environment variables
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 DB_NAME = os.environ.get('DB_NAME', 'student_results_db')
 CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
 SECRET_KEY = "your-secret-key-change-in-production"
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+SUBJECT_CACHE_TTL = float(os.environ.get('SUBJECT_CACHE_TTL', '300'))
+BULK_WRITE_CHUNK_SIZE = int(os.environ.get('BULK_WRITE_CHUNK_SIZE', '1000'))
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '64'))
+PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', '2'))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', '10000'))
+PRINCIPAL_CACHE_TTL = float(os.environ.get('PRINCIPAL_CACHE_TTL', '60'))
+STUDENT_PAGE_SIZE = int(os.environ.get('STUDENT_PAGE_SIZE', '100'))
+STUDENT_PAGE_SIZE_MAX = int(os.environ.get('STUDENT_PAGE_SIZE_MAX', '1000'))
+RANK_INDEX_REFRESH_INTERVAL = float(os.environ.get('RANK_INDEX_REFRESH_INTERVAL', '600'))
+SUBJECTS_CACHE_CONTROL = os.environ.get('SUBJECTS_CACHE_CONTROL', 'public, max-age=60')
+TRANSCRIPT_CACHE_CONTROL = os.environ.get('TRANSCRIPT_CACHE_CONTROL', 'private, no-cache')
+ANALYTICS_MAX_STALENESS = float(os.environ.get('ANALYTICS_MAX_STALENESS', '300'))
+# Exact counts scan the collections; estimated counts read collection metadata
+ANALYTICS_EXACT_COUNTS = os.environ.get('ANALYTICS_EXACT_COUNTS', 'false').lower() in ('1', 'true', 'yes')
+# Trust the role and student_id signed into the token instead of loading the user
+AUTH_TRUST_TOKEN_CLAIMS = os.environ.get('AUTH_TRUST_TOKEN_CLAIMS', 'false').lower() in ('1', 'true', 'yes')
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get('COMPRESSION_MINIMUM_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '4'))
+# Query profiling is always on when enabled here, otherwise per request via the
+# header if that is allowed; profiles expose collection names and filter shapes
+QUERY_PROFILE_ENABLED = os.environ.get('QUERY_PROFILE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+QUERY_PROFILE_ALLOW_HEADER = os.environ.get('QUERY_PROFILE_ALLOW_HEADER', 'false').lower() in ('1', 'true', 'yes')
+QUERY_PROFILE_HEADER = os.environ.get('QUERY_PROFILE_HEADER', 'X-Query-Profile')
+QUERY_PROFILE_WARN_THRESHOLD = int(os.environ.get('QUERY_PROFILE_WARN_THRESHOLD', '10'))
+QUERY_PROFILE_SLOWEST = int(os.environ.get('QUERY_PROFILE_SLOWEST', '3'))
+QUERY_PROFILE_LOG = os.environ.get('QUERY_PROFILE_LOG', 'false').lower() in ('1', 'true', 'yes')
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '2000'))
+TRANSCRIPT_BATCH_MAX = int(os.environ.get('TRANSCRIPT_BATCH_MAX', '500'))
+# Without change streams (standalone mongod) caches only expire by their TTLs
+CACHE_INVALIDATION_ENABLED = os.environ.get('CACHE_INVALIDATION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+CACHE_INVALIDATION_RETRY_DELAY = float(os.environ.get('CACHE_INVALIDATION_RETRY_DELAY', '2'))
+STUDENT_SEARCH_INDEX_ENABLED = os.environ.get('STUDENT_SEARCH_INDEX_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+STUDENT_SEARCH_LIMIT = int(os.environ.get('STUDENT_SEARCH_LIMIT', '10'))
+STUDENT_SEARCH_LIMIT_MAX = int(os.environ.get('STUDENT_SEARCH_LIMIT_MAX', '50'))
+STUDENT_SEARCH_REFRESH_INTERVAL = float(os.environ.get('STUDENT_SEARCH_REFRESH_INTERVAL', '600'))
+RESULT_STREAM_QUEUE_SIZE = int(os.environ.get('RESULT_STREAM_QUEUE_SIZE', '100'))
+RESULT_STREAM_KEEPALIVE = float(os.environ.get('RESULT_STREAM_KEEPALIVE', '15'))
+# Changed results wait this long for their summary change before being sent without GPAs
+RESULT_STREAM_HOLD_TIMEOUT = float(os.environ.get('RESULT_STREAM_HOLD_TIMEOUT', '2'))
+RESULT_STREAM_HOLD_MAX = int(os.environ.get('RESULT_STREAM_HOLD_MAX', '10000'))
+GRADING_SCALE_REFRESH_INTERVAL = float(os.environ.get('GRADING_SCALE_REFRESH_INTERVAL', '60'))
+# Workers that should only serve requests can leave background jobs to others
+JOB_RUNNER_ENABLED = os.environ.get('JOB_RUNNER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+JOB_CHUNK_SIZE = int(os.environ.get('JOB_CHUNK_SIZE', '1000'))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '5'))
+JOB_STALE_AFTER = float(os.environ.get('JOB_STALE_AFTER', '120'))
+# Bearer token for Prometheus scrapers; admins can always read the metrics
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+class FastJSONResponse(ORJSONResponse):
+    """JSON response rendered by orjson, which serializes datetimes and numpy
+    values natively. Returning one directly from a route also skips
+    FastAPI's jsonable_encoder pass over the content."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
 
-app = FastAPI(title="Student Result Management API")
+app = FastAPI(title="Student Result Management API", default_response_class=FastJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -28,14 +123,223 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# MongoDB connection
-client = pymongo.MongoClient(MONGO_URL)
-db = client[DB_NAME]
+# Response compression
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+class CompressionMiddleware:
+    """Compresses responses of at least `minimum_size` bytes with brotli or
+    gzip, whichever the client prefers (brotli when both are accepted).
+    Streamed bodies are flushed chunk by chunk so NDJSON consumers see rows
+    as they are produced; event streams are never compressed."""
+
+    def __init__(self, app, minimum_size: int, gzip_level: int, brotli_quality: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start_message = None
+        encoder = None
+        passthrough = False
+        
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                passthrough = (
+                    "content-encoding" in headers
+                    or headers.get("content-type", "").startswith("text/event-stream")
+                )
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                first_message, start_message = start_message, None
+                if passthrough or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(first_message)
+                    await send(message)
+                    return
+                encoder = _BrotliEncoder(self.brotli_quality) if encoding == "br" else _GzipEncoder(self.gzip_level)
+                headers = MutableHeaders(raw=first_message["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = encoder.compress(body) + encoder.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(first_message)
+                    await send({**message, "body": body})
+                    return
+                await send(first_message)
+            if passthrough:
+                await send(message)
+                return
+            
+            chunk = encoder.compress(body) + (encoder.flush() if more_body else encoder.finish())
+            await send({**message, "body": chunk})
+        
+        await self.app(scope, receive, send_compressed)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MINIMUM_SIZE,
+    gzip_level=GZIP_LEVEL,
+    brotli_quality=BROTLI_QUALITY,
+)
+
+# A result is unique per student, subject, semester and year
+RESULT_KEY_FIELDS = ("student_id", "subject_id", "semester", "year")
+
+# Grading
+# The built-in scale, recorded as version 1 of the grading scales on first start
+GRADE_POINTS = {"A+": 4.0, "A": 3.7, "B+": 3.3, "B": 3.0, "C+": 2.7, "C": 2.3, "F": 0.0}
+# Lower percentage bound of each grade, ascending; below the first bound is an F.
+# Both the scalar and the batch grader look grades up in this table.
+GRADE_BOUNDARIES = [(40, "C"), (50, "C+"), (60, "B"), (70, "B+"), (80, "A"), (90, "A+")]
+GRADE_THRESHOLDS = [bound for bound, _ in GRADE_BOUNDARIES]
+GRADE_LETTERS = ["F"] + [letter for _, letter in GRADE_BOUNDARIES]
+DEFAULT_CREDITS = 3
+
+# MongoDB connection (created on startup, closed on shutdown)
+client: Optional[AsyncIOMotorClient] = None
+db = None
+# pymongo.monitoring listeners registered on the client when it is created
+mongo_event_listeners = []
 
 # Collections
-users_collection = db.users
-subjects_collection = db.subjects
-results_collection = db.results
+users_collection = None
+subjects_collection = None
+results_collection = None
+student_summaries_collection = None
+versions_collection = None
+result_archives_collection = None
+archived_years_collection = None
+grading_scales_collection = None
+jobs_collection = None
+
+@app.on_event("startup")
+async def connect_to_mongo():
+    global client, db, users_collection, subjects_collection, results_collection, student_summaries_collection
+    global versions_collection, result_archives_collection, archived_years_collection
+    global grading_scales_collection, jobs_collection
+    client = AsyncIOMotorClient(MONGO_URL, maxPoolSize=MONGO_MAX_POOL_SIZE, event_listeners=mongo_event_listeners)
+    db = client[DB_NAME]
+    users_collection = db.users
+    subjects_collection = db.subjects
+    results_collection = db.results
+    student_summaries_collection = db.student_summaries
+    versions_collection = db.versions
+    result_archives_collection = db.result_archives
+    archived_years_collection = db.archived_years
+    grading_scales_collection = db.grading_scales
+    jobs_collection = db.jobs
+
+index_logger = logging.getLogger("student_results.indexes")
+
+# Duplicate key error, e.g. building a unique index over existing duplicates
+DUPLICATE_KEY_CODE = 11000
+
+async def create_unique_index(collection, keys, cleanup: str):
+    """Create a unique index, or log how to remove the existing duplicates
+    that prevent it. The app still starts; the index is built on a later
+    start once the duplicates are gone."""
+    try:
+        await collection.create_index(keys, unique=True)
+    except OperationFailure as error:
+        if error.code != DUPLICATE_KEY_CODE:
+            raise
+        index_logger.error("Unique index %s on %s was not created because of duplicates (%s). %s",
+                           keys, collection.name, error, cleanup)
+
+@app.on_event("startup")
+async def create_indexes():
+    await create_unique_index(users_collection, "id", "Remove the duplicate users.")
+    await create_unique_index(users_collection, "student_id", "Remove the duplicate users.")
+    await users_collection.create_index([("role", pymongo.ASCENDING), ("student_id", pymongo.ASCENDING)])
+    # Fallback for student search while the in-memory index is unavailable
+    await users_collection.create_index(
+        [("student_id", pymongo.TEXT), ("name", pymongo.TEXT), ("email", pymongo.TEXT)], name="users_search_text"
+    )
+    await create_unique_index(subjects_collection, "id", "Remove the duplicate subjects.")
+    await create_unique_index(subjects_collection, "code", "Remove the duplicate subjects.")
+    # Concurrent writes before this index existed could store one result twice
+    await create_unique_index(
+        results_collection, [(field, pymongo.ASCENDING) for field in RESULT_KEY_FIELDS],
+        "Run `python manage.py dedupe-results` to keep the newest result per key."
+    )
+    # Archiving deletes the results it captured by id
+    await create_unique_index(results_collection, "id", "Remove the duplicate results.")
+    await results_collection.create_index("student_id")
+    await results_collection.create_index("year")
+    await results_collection.create_index([("subject_id", pymongo.ASCENDING), ("student_id", pymongo.ASCENDING)])
+    await result_archives_collection.create_index(
+        [("student_id", pymongo.ASCENDING), ("year", pymongo.ASCENDING)], unique=True
+    )
+    await archived_years_collection.create_index("year", unique=True)
+    await student_summaries_collection.create_index("student_id", unique=True)
+    await student_summaries_collection.create_index([("overall_gpa", pymongo.DESCENDING)])
+    await grading_scales_collection.create_index("version", unique=True)
+    await jobs_collection.create_index("id", unique=True)
+    await jobs_collection.create_index([("status", pymongo.ASCENDING), ("created_at", pymongo.ASCENDING)])
+
+@app.on_event("shutdown")
+async def close_mongo_connection():
+    if client is not None:
+        client.close()
 
 # Security
 security = HTTPBearer()
@@ -59,6 +363,11 @@ class Subject(BaseModel):
     code: str
     credits: int = 3
 
+class SubjectUpdate(BaseModel):
+    name: Optional[str] = None
+    code: Optional[str] = None
+    credits: Optional[int] = None
+
 class Result(BaseModel):
     id: str = None
     student_id: str
@@ -70,6 +379,16 @@ class Result(BaseModel):
     year: str
     grade: str = None
 
+class GradeBoundary(BaseModel):
+    min_percentage: float
+    grade: str
+
+class GradingScaleInput(BaseModel):
+    # Ascending lower percentage bounds; below the first bound is failing_grade
+    boundaries: List[GradeBoundary]
+    grade_points: dict
+    failing_grade: str = "F"
+
 class ResultInput(BaseModel):
     student_id: str
     subject_id: str
@@ -78,13 +397,408 @@ class ResultInput(BaseModel):
     semester: str
     year: str
 
+class TranscriptBatchRequest(BaseModel):
+    # Either explicit student ids or a filter selecting students by their results
+    student_ids: Optional[List[str]] = None
+    subject_id: Optional[str] = None
+    semester: Optional[str] = None
+    year: Optional[str] = None
+
+# In-process caches
+class TTLCache:
+    """Bounded LRU cache whose entries also expire `ttl` seconds after being set"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+# Subject catalogue cache
+class SubjectCatalogue:
+    """In-process cache of subject id -> {id, code, name, credits}.
+
+    The whole catalogue is loaded with one query and kept for `ttl` seconds.
+    Ids missing from a fresh catalogue are fetched together with a single
+    `$in` query, so GPA calculation never issues a query per result row.
+    """
+
+    projection = {"_id": 0, "id": 1, "code": 1, "name": 1, "credits": 1}
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._subjects = {}
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def _reload(self):
+        async with self._lock:
+            if self._is_fresh():
+                return
+            subjects = await subjects_collection.find({}, self.projection).to_list(length=None)
+            self._subjects = {subject["id"]: subject for subject in subjects}
+            self._loaded_at = time.monotonic()
+
+    async def get_many(self, subject_ids) -> dict:
+        if not self._is_fresh():
+            await self._reload()
+        subject_ids = set(subject_ids)
+        missing = [subject_id for subject_id in subject_ids if subject_id not in self._subjects]
+        if missing:
+            cursor = subjects_collection.find({"id": {"$in": missing}}, self.projection)
+            async for subject in cursor:
+                self._subjects[subject["id"]] = subject
+        return {subject_id: self._subjects[subject_id] for subject_id in subject_ids if subject_id in self._subjects}
+
+    async def all(self) -> dict:
+        if not self._is_fresh():
+            await self._reload()
+        return dict(self._subjects)
+
+    async def get(self, subject_id: str) -> Optional[dict]:
+        return (await self.get_many([subject_id])).get(subject_id)
+
+    def invalidate(self, subject_id: Optional[str] = None):
+        if subject_id is None:
+            self._subjects = {}
+            self._loaded_at = None
+        else:
+            self._subjects.pop(subject_id, None)
+
+subject_catalogue = SubjectCatalogue(SUBJECT_CACHE_TTL)
+
 # Helper functions
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+# Password hashing executor
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool so hashing never competes with
+    request handling. At most `max_pending` calls may be running or queued;
+    beyond that requests are rejected with 503 and a Retry-After header."""
+
+    def __init__(self, workers: int, max_pending: int, retry_after: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.pending = 0
+        self._executor = None
+
+    def start(self):
+        # Spawned workers do not inherit the event loop or Mongo client threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, function, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="Authentication service is busy, please retry shortly",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self.run(verify_password, password, hashed)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash a batch on every worker at once. Only one hash per worker is
+        queued at a time, so logins are not stuck behind the whole batch."""
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.workers)
+        
+        async def hash_one(password: str) -> str:
+            async with slots:
+                return await loop.run_in_executor(self._executor, hash_password, password)
+        
+        return await asyncio.gather(*(hash_one(password) for password in passwords))
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_RETRY_AFTER)
+
+@app.on_event("startup")
+async def start_password_hasher():
+    password_hasher.start()
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    password_hasher.shutdown()
+
+# Metrics
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route, method and status code", ["route", "method", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["route", "method"]
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled by route", ["route"]
+)
+MONGO_COMMANDS = Counter(
+    "mongo_commands_total", "Mongo commands by collection, command and outcome", ["collection", "command", "outcome"]
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency by collection and command", ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+PASSWORD_HASH_PENDING = Gauge(
+    "password_hash_pending", "bcrypt calls running or queued in the password hashing pool"
+)
+PASSWORD_HASH_PENDING.set_function(lambda: password_hasher.pending)
+PASSWORD_HASH_WORKERS_GAUGE = Gauge(
+    "password_hash_workers", "Size of the password hashing process pool"
+)
+PASSWORD_HASH_WORKERS_GAUGE.set_function(lambda: password_hasher.workers)
+RESULT_STREAM_SUBSCRIBERS = Gauge(
+    "result_stream_subscribers", "Open result event streams in this worker"
+)
+RESULT_STREAM_SUBSCRIBERS.set_function(lambda: len(result_broker.subscriptions))
+
+def command_collection(command_name: str, command: dict) -> str:
+    """Collection a command targets; most commands name it as their first value"""
+    target = command.get(command_name)
+    return target if isinstance(target, str) else "-"
+
+class MongoMetricsListener(monitoring.CommandListener):
+    """Records per-collection command counts and durations. Callbacks run on
+    the driver's threads; the collection is only known when a command starts,
+    so it is remembered until the matching success or failure event."""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        self._pending[(event.connection_id, event.request_id)] = command_collection(event.command_name, event.command)
+
+    def _finished(self, event, outcome: str):
+        collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        MONGO_COMMANDS.labels(collection, event.command_name, outcome).inc()
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1_000_000)
+
+    def succeeded(self, event):
+        self._finished(event, "success")
+
+    def failed(self, event):
+        self._finished(event, "failure")
+
+mongo_event_listeners.append(MongoMetricsListener())
+
+def route_name(scope) -> str:
+    """Name of the endpoint function a request is routed to, e.g. add_result"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            endpoint = getattr(route, "endpoint", None)
+            return endpoint.__name__ if endpoint is not None else route.name
+    return "unmatched"
+
+class MetricsMiddleware:
+    """Per-route request latency, status codes and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        route = route_name(scope)
+        status_code = 500
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            HTTP_REQUEST_DURATION.labels(route, scope["method"]).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(route, scope["method"], str(status_code)).inc()
+
+app.add_middleware(MetricsMiddleware)
+
+# Per-request query profiler
+query_profile_logger = logging.getLogger("student_results.query_profile")
+
+def filter_shape(value):
+    """A filter with its values replaced by "?", e.g. {"student_id": "?"}"""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [filter_shape(item) for item in value[:3]]
+    return "?"
+
+def command_filter(command_name: str, command: dict):
+    if command_name == "find":
+        return command.get("filter", {})
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        return pipeline[0].get("$match", {"stage": next(iter(pipeline[0]), "?")})
+    if command_name in ("update", "delete"):
+        statements = command.get(f"{command_name}s") or [{}]
+        return statements[0].get("q", {})
+    if command_name == "findAndModify":
+        return command.get("query", {})
+    if command_name in ("count", "distinct"):
+        return command.get("query", {})
+    return {}
+
+class QueryProfile:
+    def __init__(self):
+        self.commands = []
+        self._started = {}
+
+    def start(self, event):
+        self._started[(event.connection_id, event.request_id)] = (
+            command_collection(event.command_name, event.command),
+            filter_shape(command_filter(event.command_name, event.command))
+        )
+
+    def finish(self, event):
+        collection, shape = self._started.pop((event.connection_id, event.request_id), ("-", {}))
+        self.commands.append({
+            "command": event.command_name,
+            "collection": collection,
+            "duration_ms": event.duration_micros / 1000,
+            "filter": shape
+        })
+
+    @property
+    def total_ms(self) -> float:
+        return sum(command["duration_ms"] for command in self.commands)
+
+    def slowest(self, count: int) -> List[dict]:
+        return sorted(self.commands, key=lambda command: command["duration_ms"], reverse=True)[:count]
+
+    def server_timing(self, count: int) -> str:
+        entries = [f'db;dur={self.total_ms:.2f};desc="{len(self.commands)} queries"']
+        for index, command in enumerate(self.slowest(count), start=1):
+            description = f'{command["command"]} {command["collection"]} {json.dumps(command["filter"])}'
+            description = description.replace("\\", "").replace('"', "'")
+            entries.append(f'db{index};dur={command["duration_ms"]:.2f};desc="{description}"')
+        return ", ".join(entries)
+
+# Set for the duration of a profiled request; Motor copies the context into
+# the threads that run driver calls, so the listener below can see it
+current_query_profile = contextvars.ContextVar("current_query_profile", default=None)
+
+class QueryProfileListener(monitoring.CommandListener):
+    def started(self, event):
+        profile = current_query_profile.get()
+        if profile is not None:
+            profile.start(event)
+
+    def succeeded(self, event):
+        profile = current_query_profile.get()
+        if profile is not None:
+            profile.finish(event)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+mongo_event_listeners.append(QueryProfileListener())
+
+class QueryProfilerMiddleware:
+    """Attaches the Mongo commands a request issued as Server-Timing and
+    X-Query-Count headers when profiling is enabled, or requested by header
+    where QUERY_PROFILE_ALLOW_HEADER permits it, and warns
+    when a request issues more than QUERY_PROFILE_WARN_THRESHOLD commands."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = QUERY_PROFILE_ALLOW_HEADER and \
+            Headers(scope=scope).get(QUERY_PROFILE_HEADER, "").lower() in ("1", "true")
+        if not QUERY_PROFILE_ENABLED and not requested:
+            await self.app(scope, receive, send)
+            return
+        
+        profile = QueryProfile()
+        
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                headers.append("Server-Timing", profile.server_timing(QUERY_PROFILE_SLOWEST))
+                headers["X-Query-Count"] = str(len(profile.commands))
+            await send(message)
+        
+        token = current_query_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            current_query_profile.reset(token)
+            path = scope["path"]
+            if len(profile.commands) > QUERY_PROFILE_WARN_THRESHOLD:
+                query_profile_logger.warning(
+                    "%s %s issued %d Mongo commands (threshold %d); slowest: %s",
+                    scope["method"], path, len(profile.commands), QUERY_PROFILE_WARN_THRESHOLD,
+                    json.dumps(profile.slowest(QUERY_PROFILE_SLOWEST))
+                )
+            if QUERY_PROFILE_LOG:
+                query_profile_logger.info(json.dumps({
+                    "method": scope["method"],
+                    "path": path,
+                    "queries": len(profile.commands),
+                    "db_time_ms": round(profile.total_ms, 3),
+                    "commands": profile.commands
+                }))
+
+app.add_middleware(QueryProfilerMiddleware)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(hours=24)
@@ -97,56 +811,2145 @@ def decode_access_token(token: str):
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_access_token(token)
+# Authenticated users, keyed by user id, without password or _id
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+async def load_principal(user_id: str) -> dict:
+    user = principal_cache.get(user_id)
+    if user is None:
+        user = await users_collection.find_one({"id": user_id}, {"_id": 0, "password": 0})
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        principal_cache.set(user_id, user)
+    # Callers may modify the user they get back
+    return dict(user)
+
+def token_payload(credentials: HTTPAuthorizationCredentials) -> dict:
+    payload = decode_access_token(credentials.credentials)
     user_id = payload.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = users_collection.find_one({"id": user_id})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    
-    return user
+    return payload
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    payload = token_payload(credentials)
+    if AUTH_TRUST_TOKEN_CLAIMS and payload.get("role") and payload.get("student_id"):
+        return {"id": payload["user_id"], "role": payload["role"], "student_id": payload["student_id"]}
+    return await load_principal(payload["user_id"])
+
+async def get_stream_user(request: Request, access_token: Optional[str] = None):
+    """get_current_user for event streams. EventSource cannot send headers,
+    so the token may also be passed as ?access_token="""
+    authorization = request.headers.get("authorization", "")
+    token = authorization[7:] if authorization.lower().startswith("bearer ") else access_token
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return await get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+
+async def get_current_user_profile(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Like get_current_user but always returns the full user document"""
+    return await load_principal(token_payload(credentials)["user_id"])
+
+def build_result_upsert(result_data: dict, now: datetime):
+    """Filter and update document for upserting a result on its natural key.
+    The id and created_at are only written when the result is first inserted."""
+    result_filter = {field: result_data[field] for field in RESULT_KEY_FIELDS}
+    result_update = {
+        "$set": result_data,
+        "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": now}
+    }
+    return result_filter, result_update
+
+# Grading scales
+class GradingScale:
+    """One immutable version of the grading policy: ascending lower
+    percentage bounds per grade, the grade below the first bound, and the
+    grade points of every grade."""
+
+    def __init__(self, version: int, boundaries: List[tuple], grade_points: dict, failing_grade: str = "F"):
+        self.version = version
+        self.boundaries = [(bound, letter) for bound, letter in boundaries]
+        self.grade_points = dict(grade_points)
+        self.failing_grade = failing_grade
+        self.thresholds = [bound for bound, _ in self.boundaries]
+        self.letters = [failing_grade] + [letter for _, letter in self.boundaries]
+        self._thresholds = np.array(self.thresholds, dtype=np.float64)
+        self._letters = np.array(self.letters)
+        self._letter_points = np.array([self.points(letter) for letter in self.letters])
+
+    @classmethod
+    def from_document(cls, document: dict) -> "GradingScale":
+        return cls(
+            document["version"],
+            [(boundary["min_percentage"], boundary["grade"]) for boundary in document["boundaries"]],
+            document["grade_points"],
+            document["failing_grade"]
+        )
+
+    def to_document(self) -> dict:
+        return {
+            "version": self.version,
+            "boundaries": [{"min_percentage": bound, "grade": letter} for bound, letter in self.boundaries],
+            "grade_points": self.grade_points,
+            "failing_grade": self.failing_grade
+        }
+
+    def points(self, grade: str) -> float:
+        return self.grade_points.get(grade, 0.0)
+
+    def grade(self, marks: float, max_marks: float = 100) -> str:
+        percentage = (marks / max_marks) * 100
+        return self.letters[bisect.bisect_right(self.thresholds, percentage)]
+
+    def grades(self, marks, max_marks=100):
+        """Grade many results in one vectorized pass.
+
+        Takes array-likes of marks and max_marks (a scalar max_marks is
+        broadcast) and returns (grades, grade_points) arrays. Grades match
+        grade() row for row.
+        """
+        marks = np.asarray(marks, dtype=np.float64)
+        max_marks = np.broadcast_to(np.asarray(max_marks, dtype=np.float64), marks.shape)
+        if np.any(max_marks <= 0):
+            raise ValueError("max_marks must be greater than zero")
+        percentages = (marks / max_marks) * 100
+        indexes = np.searchsorted(self._thresholds, percentages, side="right")
+        return self._letters[indexes], self._letter_points[indexes]
+
+def grading_scale_from_input(version: int, scale: GradingScaleInput) -> GradingScale:
+    """Validate a submitted scale, raising 400 when it cannot grade consistently"""
+    bounds = [boundary.min_percentage for boundary in scale.boundaries]
+    letters = [scale.failing_grade] + [boundary.grade for boundary in scale.boundaries]
+    if not bounds:
+        raise HTTPException(status_code=400, detail="A grading scale needs at least one boundary")
+    if any(low >= high for low, high in zip(bounds, bounds[1:])) or bounds[0] <= 0 or bounds[-1] > 100:
+        raise HTTPException(status_code=400, detail="Boundaries must be strictly ascending between 0 and 100")
+    if len(set(letters)) != len(letters):
+        raise HTTPException(status_code=400, detail="Each grade may appear only once")
+    missing = [letter for letter in letters if letter not in scale.grade_points]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Grade points missing for {', '.join(missing)}")
+    try:
+        grade_points = {letter: float(scale.grade_points[letter]) for letter in letters}
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Grade points must be numbers")
+    if any(points < 0 for points in grade_points.values()):
+        raise HTTPException(status_code=400, detail="Grade points cannot be negative")
+    return GradingScale(version, [(bound, letter) for bound, letter in zip(bounds, letters[1:])],
+                        grade_points, scale.failing_grade)
+
+class GradingScales:
+    """Versions of the grading scale live append-only in `grading_scales`;
+    the highest version is the active one that every grading path uses. It
+    is reloaded every `refresh_interval` seconds and whenever the cache
+    invalidation bus sees a new version."""
+
+    def __init__(self, default: GradingScale, refresh_interval: float):
+        self.default = default
+        self.active = default
+        self.refresh_interval = refresh_interval
+        self._task = None
+
+    async def refresh(self) -> GradingScale:
+        document = await grading_scales_collection.find_one({}, {"_id": 0}, sort=[("version", pymongo.DESCENDING)])
+        if document is not None:
+            self.active = GradingScale.from_document(document)
+            return self.active
+        try:
+            await grading_scales_collection.insert_one({**self.default.to_document(), "created_at": datetime.utcnow()})
+        except DuplicateKeyError:
+            pass  # Another worker recorded it first
+        self.active = self.default
+        return self.active
+
+    async def get(self, version: int) -> Optional[GradingScale]:
+        document = await grading_scales_collection.find_one({"version": version}, {"_id": 0})
+        return GradingScale.from_document(document) if document else None
+
+    async def create(self, scale: GradingScaleInput, created_by: str) -> GradingScale:
+        """Record a new version and make it active"""
+        while True:
+            latest = await self.refresh()
+            created = grading_scale_from_input(latest.version + 1, scale)
+            try:
+                await grading_scales_collection.insert_one({
+                    **created.to_document(), "created_at": datetime.utcnow(), "created_by": created_by
+                })
+            except DuplicateKeyError:
+                continue  # A concurrent create took this version number
+            self.active = created
+            return created
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except PyMongoError:
+                pass  # Keep grading with the scale we have
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+grading_scales = GradingScales(
+    GradingScale(1, GRADE_BOUNDARIES, GRADE_POINTS, GRADE_LETTERS[0]), GRADING_SCALE_REFRESH_INTERVAL
+)
+
+@app.on_event("startup")
+async def start_grading_scales():
+    await grading_scales.start()
+
+@app.on_event("shutdown")
+async def stop_grading_scales():
+    await grading_scales.stop()
 
 def calculate_grade(marks: float, max_marks: float = 100) -> str:
-    percentage = (marks / max_marks) * 100
-    if percentage >= 90: return "A+"
-    elif percentage >= 80: return "A"
-    elif percentage >= 70: return "B+"
-    elif percentage >= 60: return "B"
-    elif percentage >= 50: return "C+"
-    elif percentage >= 40: return "C"
-    else: return "F"
-
-def calculate_gpa(results: List[dict]) -> float:
-    grade_points = {"A+": 4.0, "A": 3.7, "B+": 3.3, "B": 3.0, "C+": 2.7, "C": 2.3, "F": 0.0}
+    return grading_scales.active.grade(marks, max_marks)
+
+def calculate_grades(marks, max_marks=100):
+    """Grade many results with the active scale; see GradingScale.grades"""
+    return grading_scales.active.grades(marks, max_marks)
+
+def gpa_from_totals(total_points: float, total_credits: float) -> float:
+    return round(total_points / total_credits, 2) if total_credits > 0 else 0.0
+
+async def calculate_gpa(results: List[dict]) -> float:
     total_points = 0
     total_credits = 0
+    subjects = await subject_catalogue.get_many(result["subject_id"] for result in results)
+    scale = grading_scales.active
     
     for result in results:
-        subject = subjects_collection.find_one({"id": result["subject_id"]})
-        credits = subject.get("credits", 3) if subject else 3
-        points = grade_points.get(result["grade"], 0.0)
+        subject = subjects.get(result["subject_id"])
+        credits = subject.get("credits", DEFAULT_CREDITS) if subject else DEFAULT_CREDITS
+        points = scale.points(result["grade"])
         total_points += points * credits
         total_credits += credits
     
-    return round(total_points / total_credits, 2) if total_credits > 0 else 0.0
+    return gpa_from_totals(total_points, total_credits)
+
+# Transcript engine
+def grade_points_expression(grade: str) -> dict:
+    """Aggregation expression mapping a grade field to its grade points
+    under the active grading scale"""
+    grade_points = grading_scales.active.grade_points
+    return {"$switch": {
+        "branches": [{"case": {"$eq": [grade, letter]}, "then": points} for letter, points in grade_points.items()],
+        "default": 0.0
+    }}
+
+def credit_points_stages() -> List[dict]:
+    """Stages that join each result with its subject credits and reshape it to
+    {result, credits, points}"""
+    return [
+        {"$lookup": {"from": "subjects", "localField": "subject_id", "foreignField": "id", "as": "_subject"}},
+        {"$replaceRoot": {"newRoot": {
+            "result": "$$ROOT",
+            "credits": {"$ifNull": [{"$arrayElemAt": ["$_subject.credits", 0]}, DEFAULT_CREDITS]},
+            "points": grade_points_expression("$grade")
+        }}},
+        {"$project": {"result._id": 0, "result._subject": 0}}
+    ]
+
+def transcript_pipeline(student_id: str) -> List[dict]:
+    """One aggregation that joins subject credits and groups a student's
+    results by year and semester with their weighted grade point totals."""
+    return [
+        {"$match": {"student_id": student_id}},
+        *credit_points_stages(),
+        {"$group": {
+            "_id": {"year": "$result.year", "semester": "$result.semester"},
+            "results": {"$push": "$result"},
+            "credits": {"$sum": "$credits"},
+            "points": {"$sum": {"$multiply": ["$points", "$credits"]}}
+        }},
+        union_archived_semesters({"student_id": student_id}, {
+            "_id": {"year": "$year", "semester": "$semesters.semester"},
+            "results": "$semesters.results",
+            "credits": "$semesters.credits",
+            "points": "$semesters.points"
+        }),
+        {"$sort": {"_id.year": 1, "_id.semester": 1}}
+    ]
+
+async def build_transcript(student_id: str) -> dict:
+    """Results grouped by "{year}-{semester}" with semester and overall GPAs.
+    Python only touches one row per semester, never individual results."""
+    semesters = await results_collection.aggregate(transcript_pipeline(student_id)).to_list(length=None)
+    
+    grouped_results = {}
+    semester_gpas = {}
+    total_points = 0
+    total_credits = 0
+    total_subjects = 0
+    
+    for semester in semesters:
+        key = f"{semester['_id']['year']}-{semester['_id']['semester']}"
+        grouped_results[key] = semester["results"]
+        semester_gpas[key] = gpa_from_totals(semester["points"], semester["credits"])
+        total_points += semester["points"]
+        total_credits += semester["credits"]
+        total_subjects += len(semester["results"])
+    
+    return {
+        "results_by_semester": grouped_results,
+        "semester_gpas": semester_gpas,
+        "overall_gpa": gpa_from_totals(total_points, total_credits),
+        "total_subjects": total_subjects
+    }
+
+# Archived results
+# Closed academic years are moved out of `results` into one immutable
+# snapshot per student and year in `result_archives`, shaped as
+# {student_id, year, semesters: [{semester, credits, points, subjects, gpa, results}]}
+# so the live collection only holds open years. Credits and grade points are
+# frozen when a year is archived. Readers add archived data with $unionWith.
+def archived_results_stages(match: dict) -> List[dict]:
+    """Stages that unwind archive snapshots back into result documents"""
+    snapshot_match = {field: match[field] for field in ("student_id", "year") if field in match}
+    return [
+        {"$match": snapshot_match},
+        {"$unwind": "$semesters"},
+        {"$unwind": "$semesters.results"},
+        {"$replaceRoot": {"newRoot": "$semesters.results"}},
+        {"$match": match}
+    ]
+
+def union_archived_results(match: dict) -> dict:
+    """$unionWith stage adding the archived results matching `match`"""
+    return {"$unionWith": {"coll": result_archives_collection.name, "pipeline": archived_results_stages(match)}}
+
+def union_archived_semesters(match: dict, new_root: dict) -> dict:
+    """$unionWith stage adding one document per archived semester of the
+    matching snapshots, reshaped by `new_root` (which can refer to
+    $student_id, $year and the $semesters.* fields)"""
+    return {"$unionWith": {"coll": result_archives_collection.name, "pipeline": [
+        {"$match": match},
+        {"$unwind": "$semesters"},
+        {"$replaceRoot": {"newRoot": new_root}}
+    ]}}
+
+async def is_year_archived(year: str) -> bool:
+    return await archived_years_collection.find_one({"year": year}, {"_id": 1}) is not None
+
+async def archived_result_count() -> int:
+    totals = await archived_years_collection.aggregate([
+        {"$group": {"_id": None, "results": {"$sum": {"$ifNull": ["$results", 0]}}}}
+    ]).to_list(length=None)
+    return totals[0]["results"] if totals else 0
+
+async def archive_year(year: str, chunk_size: int = 500) -> dict:
+    """Move a closed year's results into per-student snapshots. The year is
+    closed to writes first and snapshots are only ever inserted, so an
+    interrupted run can simply be repeated."""
+    await archived_years_collection.update_one(
+        {"year": year},
+        {"$setOnInsert": {"year": year, "status": "archiving", "started_at": datetime.utcnow()}},
+        upsert=True
+    )
+    pipeline = [
+        {"$match": {"year": year}},
+        *credit_points_stages(),
+        {"$group": {
+            "_id": {"student_id": "$result.student_id", "semester": "$result.semester"},
+            "results": {"$push": "$result"},
+            "credits": {"$sum": "$credits"},
+            "points": {"$sum": {"$multiply": ["$points", "$credits"]}},
+            "subjects": {"$sum": 1}
+        }},
+        {"$sort": {"_id.semester": 1}},
+        {"$group": {
+            "_id": "$_id.student_id",
+            "semesters": {"$push": {
+                "semester": "$_id.semester",
+                "credits": "$credits",
+                "points": "$points",
+                "subjects": "$subjects",
+                "results": "$results"
+            }}
+        }}
+    ]
+    
+    async def flush(rows: List[dict]):
+        now = datetime.utcnow()
+        operations = []
+        result_ids = []
+        for row in rows:
+            for semester in row["semesters"]:
+                semester["gpa"] = gpa_from_totals(semester["points"], semester["credits"])
+                result_ids.extend(result["id"] for result in semester["results"])
+            snapshot = {"student_id": row["_id"], "year": year, "semesters": row["semesters"], "archived_at": now}
+            operations.append(UpdateOne(
+                {"student_id": row["_id"], "year": year}, {"$setOnInsert": snapshot}, upsert=True
+            ))
+        await result_archives_collection.bulk_write(operations, ordered=False)
+        # Only the results captured in the snapshots are removed
+        await results_collection.delete_many({"id": {"$in": result_ids}})
+    
+    rows = []
+    async for row in results_collection.aggregate(pipeline, allowDiskUse=True):
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            await flush(rows)
+            rows = []
+    if rows:
+        await flush(rows)
+    
+    totals = await result_archives_collection.aggregate([
+        {"$match": {"year": year}},
+        {"$unwind": "$semesters"},
+        {"$group": {"_id": "$student_id", "results": {"$sum": "$semesters.subjects"}}},
+        {"$group": {"_id": None, "students": {"$sum": 1}, "results": {"$sum": "$results"}}}
+    ]).to_list(length=None)
+    students, results = (totals[0]["students"], totals[0]["results"]) if totals else (0, 0)
+    await archived_years_collection.update_one({"year": year}, {"$set": {
+        "status": "archived", "archived_at": datetime.utcnow(), "students": students, "results": results
+    }})
+    return {"year": year, "students": students, "results": results}
+
+# Student GPA summaries
+def summary_semester_field(year: str, semester: str) -> str:
+    """Key of a semester inside a summary's `semesters` map. Dots and dollar
+    signs are not allowed in field names, so they are replaced."""
+    return f"{year}-{semester}".replace(".", "_").replace("$", "_")
+
+def semester_gpa_expression(path: str) -> dict:
+    return {"$cond": [
+        {"$gt": [f"${path}credits", 0]},
+        {"$round": [{"$divide": [f"${path}points", f"${path}credits"]}, 2]},
+        0.0
+    ]}
+
+async def apply_result_to_summary(student_id: str, year: str, semester: str,
+                                  credits_delta: float, points_delta: float, subjects_delta: int):
+    """Incrementally fold one result change into the student's summary.
+    Runs as a single pipeline update so totals and GPAs never disagree.
+    A student without a summary (new, or with results from before summaries
+    existed) gets one rebuilt from all of their results instead."""
+    path = f"semesters.{summary_semester_field(year, semester)}."
+
+    def add(field, delta):
+        return {"$add": [{"$ifNull": [f"${field}", 0]}, delta]}
+
+    summary = await student_summaries_collection.find_one_and_update(
+        {"student_id": student_id},
+        [
+            {"$set": {
+                # User input; a value starting with $ would be read as a field path
+                f"{path}year": {"$literal": year},
+                f"{path}semester": {"$literal": semester},
+                f"{path}credits": add(f"{path}credits", credits_delta),
+                f"{path}points": add(f"{path}points", points_delta),
+                f"{path}subjects": add(f"{path}subjects", subjects_delta),
+                "total_credits": add("total_credits", credits_delta),
+                "total_points": add("total_points", points_delta),
+                "total_subjects": add("total_subjects", subjects_delta),
+                "updated_at": datetime.utcnow()
+            }},
+            {"$set": {
+                f"{path}gpa": semester_gpa_expression(path),
+                "overall_gpa": semester_gpa_expression("total_")
+            }}
+        ],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if summary is None:
+        await rebuild_student_summaries([student_id])
+        return await student_summaries_collection.find_one({"student_id": student_id}, {"_id": 0})
+    rank_index.update_student(summary)
+    return summary
+
+def summary_document(student_id: str, semesters: List[dict], now: datetime) -> dict:
+    """Build a full summary document from per-semester credit/point totals"""
+    summary = {
+        "student_id": student_id,
+        "semesters": {},
+        "total_credits": 0,
+        "total_points": 0,
+        "total_subjects": 0,
+        "updated_at": now
+    }
+    for semester in semesters:
+        summary["semesters"][summary_semester_field(semester["year"], semester["semester"])] = {
+            **semester, "gpa": gpa_from_totals(semester["points"], semester["credits"])
+        }
+        summary["total_credits"] += semester["credits"]
+        summary["total_points"] += semester["points"]
+        summary["total_subjects"] += semester["subjects"]
+    summary["overall_gpa"] = gpa_from_totals(summary["total_points"], summary["total_credits"])
+    return summary
+
+def summary_semesters_pipeline(student_match: dict) -> List[dict]:
+    """Per-student semester credit/point totals from live and archived
+    results, one {_id: student_id, semesters} row per student"""
+    return [
+        {"$match": student_match},
+        *credit_points_stages(),
+        {"$group": {
+            "_id": {"student_id": "$result.student_id", "year": "$result.year", "semester": "$result.semester"},
+            "credits": {"$sum": "$credits"},
+            "points": {"$sum": {"$multiply": ["$points", "$credits"]}},
+            "subjects": {"$sum": 1}
+        }},
+        union_archived_semesters(student_match, {
+            "_id": {"student_id": "$student_id", "year": "$year", "semester": "$semesters.semester"},
+            "credits": "$semesters.credits",
+            "points": "$semesters.points",
+            "subjects": "$semesters.subjects"
+        }),
+        {"$group": {
+            "_id": "$_id.student_id",
+            "semesters": {"$push": {
+                "year": "$_id.year",
+                "semester": "$_id.semester",
+                "credits": "$credits",
+                "points": "$points",
+                "subjects": "$subjects"
+            }}
+        }}
+    ]
+
+async def rebuild_student_summaries(student_ids: Optional[List[str]] = None, chunk_size: int = 1000) -> int:
+    """Recompute summaries from live and archived results, for the given
+    students or for everyone. Returns the number of summaries written."""
+    started_at = datetime.utcnow()
+    student_match = {"student_id": {"$in": student_ids}} if student_ids is not None else {}
+    pipeline = summary_semesters_pipeline(student_match)
+    
+    written = 0
+    operations = []
+    rebuilt_students = set()
+    async for row in results_collection.aggregate(pipeline, allowDiskUse=True):
+        summary = summary_document(row["_id"], row["semesters"], started_at)
+        operations.append(ReplaceOne({"student_id": row["_id"]}, summary, upsert=True))
+        rank_index.update_student(summary)
+        rebuilt_students.add(row["_id"])
+        if len(operations) >= chunk_size:
+            await student_summaries_collection.bulk_write(operations, ordered=False)
+            written += len(operations)
+            operations = []
+    if operations:
+        await student_summaries_collection.bulk_write(operations, ordered=False)
+        written += len(operations)
+    
+    # Summaries not touched by this rebuild belong to students without results
+    stale_filter = {"updated_at": {"$lt": started_at}}
+    if student_ids is not None:
+        stale_filter["student_id"] = {"$in": student_ids}
+    await student_summaries_collection.delete_many(stale_filter)
+    if student_ids is None:
+        await rank_index.rebuild()
+    else:
+        for student_id in set(student_ids) - rebuilt_students:
+            rank_index.remove_student(student_id)
+    return written
+
+async def dedupe_results(chunk_size: int = 1000) -> dict:
+    """Keep the most recently updated result per (student_id, subject_id,
+    semester, year) and delete the others, then rebuild the affected
+    summaries. For databases written before the unique result index existed."""
+    pipeline = [
+        {"$sort": {"updated_at": -1, "_id": -1}},
+        {"$group": {
+            "_id": {field: f"${field}" for field in RESULT_KEY_FIELDS},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+    keys = 0
+    duplicate_ids = []
+    student_ids = set()
+    async for group in results_collection.aggregate(pipeline, allowDiskUse=True):
+        keys += 1
+        duplicate_ids.extend(group["ids"][1:])
+        student_ids.add(group["_id"]["student_id"])
+    
+    removed = 0
+    for start in range(0, len(duplicate_ids), chunk_size):
+        removed += (await results_collection.delete_many(
+            {"_id": {"$in": duplicate_ids[start:start + chunk_size]}}
+        )).deleted_count
+    student_ids = sorted(student_ids)
+    for start in range(0, len(student_ids), chunk_size):
+        await rebuild_student_summaries(student_ids[start:start + chunk_size])
+    await bump_versions([student_version_key(student_id) for student_id in student_ids])
+    return {"keys": keys, "removed": removed, "students": len(student_ids)}
+
+def grouped_results_pipeline(student_id: str) -> List[dict]:
+    return [
+        {"$match": {"student_id": student_id}},
+        {"$project": {"_id": 0}},
+        {"$group": {"_id": {"year": "$year", "semester": "$semester"}, "results": {"$push": "$$ROOT"}}},
+        union_archived_semesters({"student_id": student_id}, {
+            "_id": {"year": "$year", "semester": "$semesters.semester"},
+            "results": "$semesters.results"
+        }),
+        {"$sort": {"_id.year": 1, "_id.semester": 1}}
+    ]
+
+def gpas_from_summary(summary: dict) -> dict:
+    semester_gpas = {
+        f"{semester['year']}-{semester['semester']}": gpa_from_totals(semester["points"], semester["credits"])
+        for semester in sorted(summary["semesters"].values(), key=lambda s: (s["year"], s["semester"]))
+    }
+    return {
+        "semester_gpas": semester_gpas,
+        "overall_gpa": gpa_from_totals(summary["total_points"], summary["total_credits"]),
+        "total_subjects": summary["total_subjects"]
+    }
+
+def batch_grouped_results_pipeline(student_ids: List[str]) -> List[dict]:
+    return [
+        {"$match": {"student_id": {"$in": student_ids}}},
+        {"$project": {"_id": 0}},
+        {"$group": {
+            "_id": {"student_id": "$student_id", "year": "$year", "semester": "$semester"},
+            "results": {"$push": "$$ROOT"}
+        }},
+        union_archived_semesters({"student_id": {"$in": student_ids}}, {
+            "_id": {"student_id": "$student_id", "year": "$year", "semester": "$semesters.semester"},
+            "results": "$semesters.results"
+        }),
+        {"$sort": {"_id.student_id": 1, "_id.year": 1, "_id.semester": 1}}
+    ]
+
+async def read_transcripts(student_ids: List[str]) -> dict:
+    """Transcripts for many students from one summaries query and one
+    grouped aggregation. GPAs of students without a summary are computed
+    together by one more aggregation."""
+    summaries, semesters = await asyncio.gather(
+        student_summaries_collection.find({"student_id": {"$in": student_ids}}, {"_id": 0}).to_list(length=None),
+        results_collection.aggregate(batch_grouped_results_pipeline(student_ids)).to_list(length=None)
+    )
+    summaries = {summary["student_id"]: summary for summary in summaries}
+    missing = [student_id for student_id in student_ids if student_id not in summaries]
+    if missing:
+        now = datetime.utcnow()
+        summaries.update({student_id: summary_document(student_id, [], now) for student_id in missing})
+        async for row in results_collection.aggregate(
+            summary_semesters_pipeline({"student_id": {"$in": missing}}), allowDiskUse=True
+        ):
+            summaries[row["_id"]] = summary_document(row["_id"], row["semesters"], now)
+    grouped_results = {student_id: {} for student_id in student_ids}
+    for semester in semesters:
+        key = f"{semester['_id']['year']}-{semester['_id']['semester']}"
+        grouped_results[semester["_id"]["student_id"]][key] = semester["results"]
+    
+    return {
+        student_id: {"results_by_semester": grouped_results[student_id], **gpas_from_summary(summaries[student_id])}
+        for student_id in student_ids
+    }
+
+async def read_transcript(student_id: str) -> dict:
+    """Transcript with GPAs read from the student's summary document. Falls
+    back to the full aggregation when no summary has been built yet."""
+    summary, semesters = await asyncio.gather(
+        student_summaries_collection.find_one({"student_id": student_id}, {"_id": 0}),
+        results_collection.aggregate(grouped_results_pipeline(student_id)).to_list(length=None)
+    )
+    if summary is None:
+        return await build_transcript(student_id)
+    
+    grouped_results = {
+        f"{semester['_id']['year']}-{semester['_id']['semester']}": semester["results"]
+        for semester in semesters
+    }
+    return {"results_by_semester": grouped_results, **gpas_from_summary(summary)}
+
+# GPA rank index
+class RankIndex:
+    """Students sorted by GPA, kept in memory per scope: "overall" and one
+    scope per "{year}-{semester}". Each scope is a sorted list of
+    (-gpa, student_id) so rank lookups are a binary search. It is loaded from
+    student_summaries on startup, updated whenever a summary changes and
+    reloaded every `refresh_interval` seconds to pick up other workers' writes."""
+
+    OVERALL = "overall"
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._ranked = {}
+        self._gpas = {}
+        self._task = None
+
+    @staticmethod
+    def student_gpas(summary: dict) -> dict:
+        gpas = gpas_from_summary(summary)
+        return {RankIndex.OVERALL: gpas["overall_gpa"], **gpas["semester_gpas"]}
+
+    def _set(self, scope: str, student_id: str, gpa: Optional[float]):
+        ranked = self._ranked.setdefault(scope, [])
+        gpas = self._gpas.setdefault(scope, {})
+        previous = gpas.pop(student_id, None)
+        if previous is not None:
+            index = bisect.bisect_left(ranked, (-previous, student_id))
+            if index < len(ranked) and ranked[index] == (-previous, student_id):
+                del ranked[index]
+        if gpa is not None:
+            gpas[student_id] = gpa
+            bisect.insort(ranked, (-gpa, student_id))
+
+    def update_student(self, summary: dict):
+        student_id = summary["student_id"]
+        gpas = self.student_gpas(summary)
+        for scope in set(gpas) | {scope for scope, members in self._gpas.items() if student_id in members}:
+            self._set(scope, student_id, gpas.get(scope))
+
+    def remove_student(self, student_id: str):
+        for scope in [scope for scope, members in self._gpas.items() if student_id in members]:
+            self._set(scope, student_id, None)
+
+    async def rebuild(self):
+        ranked = {}
+        gpas = {}
+        cursor = student_summaries_collection.find({}, {"_id": 0, "student_id": 1, "semesters": 1,
+                                                        "total_points": 1, "total_credits": 1, "total_subjects": 1})
+        async for summary in cursor.batch_size(1000):
+            for scope, gpa in self.student_gpas(summary).items():
+                ranked.setdefault(scope, []).append((-gpa, summary["student_id"]))
+                gpas.setdefault(scope, {})[summary["student_id"]] = gpa
+        for entries in ranked.values():
+            entries.sort()
+        self._ranked, self._gpas = ranked, gpas
+
+    def cohort_size(self, scope: str) -> int:
+        return len(self._ranked.get(scope, []))
+
+    def top(self, scope: str, limit: int) -> List[dict]:
+        entries = self._ranked.get(scope, [])[:limit]
+        return [
+            {"student_id": student_id, "gpa": -negative_gpa, "rank": self.rank_of_gpa(scope, -negative_gpa)}
+            for negative_gpa, student_id in entries
+        ]
+
+    def rank_of_gpa(self, scope: str, gpa: float) -> int:
+        """Competition rank: 1 + the number of students with a higher GPA"""
+        return bisect.bisect_left(self._ranked.get(scope, []), (-gpa, "")) + 1
+
+    def student_rank(self, scope: str, student_id: str) -> Optional[dict]:
+        gpa = self._gpas.get(scope, {}).get(student_id)
+        if gpa is None:
+            return None
+        rank = self.rank_of_gpa(scope, gpa)
+        cohort_size = self.cohort_size(scope)
+        return {
+            "student_id": student_id,
+            "gpa": gpa,
+            "rank": rank,
+            "cohort_size": cohort_size,
+            # Share of the cohort with the same or a lower GPA
+            "percentile": round(100 * (cohort_size - rank + 1) / cohort_size, 2)
+        }
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.rebuild()
+            except Exception:
+                pass
+
+    async def start(self):
+        await self.rebuild()
+        self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+rank_index = RankIndex(RANK_INDEX_REFRESH_INTERVAL)
+
+@app.on_event("startup")
+async def start_rank_index():
+    await rank_index.start()
+
+@app.on_event("shutdown")
+async def stop_rank_index():
+    await rank_index.stop()
+
+def rank_scope(year: Optional[str], semester: Optional[str]) -> str:
+    if year is None and semester is None:
+        return RankIndex.OVERALL
+    if year is None or semester is None:
+        raise HTTPException(status_code=400, detail="year and semester must be given together")
+    return f"{year}-{semester}"
+
+# Student search index
+class StudentSearchIndex:
+    """In-memory typeahead over students' student_id, name and email.
+
+    Prefix matches come from a sorted array of (key, student_id) pairs, where
+    the keys are the lower-cased fields and every word of the name, searched
+    with bisect. Fuzzy matches come from a trigram index: a student must share
+    at least `fuzzy_threshold` of the query's trigrams, and candidates are
+    only drawn from the query's rarest trigrams, at most `fuzzy_candidates`
+    of them, so common trigrams stay cheap.
+    """
+
+    fuzzy_threshold = 0.5
+    fuzzy_candidates = 2000
+    projection = {"_id": 0, "id": 1, "student_id": 1, "name": 1, "email": 1}
+
+    def __init__(self, refresh_interval: float = STUDENT_SEARCH_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.ready = False
+        self._students = {}
+        self._keys = []
+        self._trigrams = {}
+        self._task = None
+
+    @staticmethod
+    def search_keys(student: dict) -> set:
+        name = student["name"].lower()
+        email = student["email"].lower()
+        return {student["student_id"].lower(), name, email, email.split("@")[0], *name.split()}
+
+    @staticmethod
+    def trigrams(text: str) -> set:
+        return {text[index:index + 3] for index in range(len(text) - 2)}
+
+    def student_trigrams(self, student: dict) -> set:
+        # Email domains are shared by nearly everyone, so only the local part counts
+        email = student["email"].lower().split("@")[0]
+        return self.trigrams(student["student_id"].lower()) | self.trigrams(student["name"].lower()) | self.trigrams(email)
+
+    def _add(self, student: dict):
+        student = {field: student[field] for field in self.projection if field != "_id"}
+        self._students[student["student_id"]] = student
+        for key in self.search_keys(student):
+            bisect.insort(self._keys, (key, student["student_id"]))
+        for gram in self.student_trigrams(student):
+            self._trigrams.setdefault(gram, set()).add(student["student_id"])
+
+    def remove(self, student_id: str):
+        student = self._students.pop(student_id, None)
+        if student is None:
+            return
+        for key in self.search_keys(student):
+            index = bisect.bisect_left(self._keys, (key, student_id))
+            if index < len(self._keys) and self._keys[index] == (key, student_id):
+                del self._keys[index]
+        for gram in self.student_trigrams(student):
+            postings = self._trigrams.get(gram)
+            if postings is not None:
+                postings.discard(student_id)
+                if not postings:
+                    del self._trigrams[gram]
+
+    def add(self, student: dict):
+        """Index a new or changed student; other roles are dropped"""
+        self.remove(student["student_id"])
+        if student.get("role", "student") == "student":
+            self._add(student)
+
+    async def rebuild(self):
+        students = await users_collection.find({"role": "student"}, self.projection).to_list(length=None)
+        rebuilt = StudentSearchIndex()
+        for student in students:
+            rebuilt._students[student["student_id"]] = student
+            for key in rebuilt.search_keys(student):
+                rebuilt._keys.append((key, student["student_id"]))
+            for gram in rebuilt.student_trigrams(student):
+                rebuilt._trigrams.setdefault(gram, set()).add(student["student_id"])
+        rebuilt._keys.sort()
+        self._students, self._keys, self._trigrams = rebuilt._students, rebuilt._keys, rebuilt._trigrams
+        self.ready = True
+
+    def prefix_matches(self, query: str, limit: int) -> List[str]:
+        matches = []
+        index = bisect.bisect_left(self._keys, (query,))
+        while index < len(self._keys) and len(matches) < limit:
+            key, student_id = self._keys[index]
+            if not key.startswith(query):
+                break
+            if student_id not in matches:
+                matches.append(student_id)
+            index += 1
+        return matches
+
+    def fuzzy_matches(self, query: str, limit: int, exclude: List[str]) -> List[str]:
+        grams = self.trigrams(query)
+        if not grams:
+            return []
+        required = max(1, int(len(grams) * self.fuzzy_threshold + 0.999))
+        postings = sorted((self._trigrams.get(gram, set()) for gram in grams), key=len)
+        # A student sharing `required` trigrams appears in one of the rarest len - required + 1
+        candidates = set()
+        for posting in postings[:len(grams) - required + 1]:
+            candidates.update(itertools.islice(posting, self.fuzzy_candidates - len(candidates)))
+            if len(candidates) >= self.fuzzy_candidates:
+                break
+        candidates -= set(exclude)
+        scored = []
+        for student_id in candidates:
+            shared = sum(1 for posting in postings if student_id in posting)
+            if shared >= required:
+                scored.append((-shared, student_id))
+        return [student_id for _, student_id in sorted(scored)[:limit]]
+
+    def search(self, query: str, limit: int) -> List[dict]:
+        query = query.strip().lower()
+        matches = self.prefix_matches(query, limit)
+        if len(matches) < limit:
+            matches += self.fuzzy_matches(query, limit - len(matches), matches)
+        return [dict(self._students[student_id]) for student_id in matches]
+
+    async def _refresh_periodically(self):
+        # Searches go to Mongo until the first build completes
+        try:
+            await self.rebuild()
+        except Exception:
+            pass
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            # Change streams keep the index current; without them, edits made
+            # by other workers only show up here
+            if cache_invalidation_bus.mode == "change_streams":
+                continue
+            try:
+                await self.rebuild()
+            except Exception:
+                pass
+
+    def start(self):
+        self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+student_search_index = StudentSearchIndex()
+
+@app.on_event("startup")
+async def start_student_search_index():
+    if STUDENT_SEARCH_INDEX_ENABLED:
+        student_search_index.start()
+
+@app.on_event("shutdown")
+async def stop_student_search_index():
+    await student_search_index.stop()
+
+async def search_students_in_database(query: str, limit: int) -> List[dict]:
+    """Prefix matches, topped up from the text index, straight from Mongo"""
+    prefix = "^" + re.escape(query)
+    students = await users_collection.find({"role": "student", "$or": [
+        {"student_id": {"$regex": prefix}},
+        {"name": {"$regex": prefix, "$options": "i"}},
+        {"email": {"$regex": prefix, "$options": "i"}}
+    ]}, StudentSearchIndex.projection).sort("student_id", pymongo.ASCENDING).limit(limit).to_list(length=None)
+    if len(students) < limit:
+        found = [student["student_id"] for student in students]
+        students += await users_collection.find(
+            {"role": "student", "student_id": {"$nin": found}, "$text": {"$search": query}},
+            {**StudentSearchIndex.projection, "score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})]).limit(limit - len(students)).to_list(length=None)
+        for student in students:
+            student.pop("score", None)
+    return students
+
+# Bulk result import
+BULK_UPLOAD_FORMATS = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+
+async def iter_upload_lines(request: Request):
+    """Split a streamed request body into raw lines without buffering it all"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if buffer:
+        yield buffer.rstrip(b"\r")
+
+async def iter_upload_rows(request: Request, upload_format: str):
+    """Yield (line_number, row) pairs; row is a dict or the parse error message"""
+    header = None
+    line_number = 0
+    async for raw_line in iter_upload_lines(request):
+        line_number += 1
+        # Only the first line can start with a byte order mark
+        try:
+            line = raw_line.decode("utf-8-sig" if line_number == 1 else "utf-8")
+        except UnicodeDecodeError as error:
+            yield line_number, f"Invalid UTF-8 at byte {error.start}"
+            continue
+        if not line.strip():
+            continue
+        if upload_format == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [column.strip() for column in values]
+                continue
+            # Blank cells fall back to the model defaults (e.g. max_marks)
+            yield line_number, {column: value for column, value in zip(header, values) if value.strip()}
+        else:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as error:
+                yield line_number, f"Invalid JSON: {error.msg}"
+                continue
+            yield line_number, row if isinstance(row, dict) else "Each line must be a JSON object"
+
+class BulkResultImport:
+    """Validates, grades and upserts uploaded results in unordered chunks.
+    Student ids and subjects are loaded once for the whole upload."""
+
+    def __init__(self, known_students: set, subjects: dict, archived_years: set, chunk_size: int):
+        self.known_students = known_students
+        self.subjects = subjects
+        self.archived_years = archived_years
+        self.chunk_size = chunk_size
+        # Natural key -> (line_number, result_data); later rows win within a chunk
+        self.pending = {}
+        self.touched_students = set()
+        # student_id -> imported results that have open event streams
+        self.watched_results = {}
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []
+
+    def add_error(self, line_number: int, error: str):
+        self.errors.append({"line": line_number, "error": error})
+
+    async def add(self, line_number: int, row):
+        self.rows += 1
+        if isinstance(row, str):
+            self.add_error(line_number, row)
+            return
+        try:
+            result = ResultInput(**row)
+        except ValidationError as error:
+            self.add_error(line_number, "; ".join(
+                f"{'.'.join(str(part) for part in issue['loc'])}: {issue['msg']}" for issue in error.errors()
+            ))
+            return
+        if result.max_marks <= 0:
+            self.add_error(line_number, "max_marks must be greater than zero")
+            return
+        if result.student_id not in self.known_students:
+            self.add_error(line_number, "Student not found")
+            return
+        subject = self.subjects.get(result.subject_id)
+        if subject is None:
+            self.add_error(line_number, "Subject not found")
+            return
+        if result.year in self.archived_years:
+            self.add_error(line_number, f"Results for {result.year} are archived and read-only")
+            return
+        
+        result_data = {**result.model_dump(), "subject_name": subject["name"]}
+        key = tuple(result_data[field] for field in RESULT_KEY_FIELDS)
+        self.pending.pop(key, None)
+        self.pending[key] = (line_number, result_data)
+        if len(self.pending) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        line_numbers, batch = zip(*self.pending.values())
+        self.pending = {}
+        
+        now = datetime.utcnow()
+        scale = grading_scales.active
+        grades, _ = scale.grades(
+            [result_data["marks"] for result_data in batch],
+            [result_data["max_marks"] for result_data in batch]
+        )
+        operations = []
+        for result_data, grade in zip(batch, grades.tolist()):
+            result_data["grade"] = grade
+            result_data["scale_version"] = scale.version
+            result_data["updated_at"] = now
+            operations.append(UpdateOne(*build_result_upsert(result_data, now), upsert=True))
+        
+        failed = set()
+        try:
+            outcome = (await results_collection.bulk_write(operations, ordered=False)).bulk_api_result
+        except BulkWriteError as error:
+            outcome = error.details
+            for write_error in outcome["writeErrors"]:
+                failed.add(write_error["index"])
+                self.add_error(line_numbers[write_error["index"]], write_error["errmsg"])
+        
+        self.inserted += outcome["nUpserted"]
+        self.updated += outcome["nMatched"]
+        self.touched_students.update(
+            result_data["student_id"] for index, result_data in enumerate(batch) if index not in failed
+        )
+        if result_broker.publishes_locally:
+            for index, result_data in enumerate(batch):
+                if index not in failed and result_broker.is_watched(result_data):
+                    self.watched_results.setdefault(result_data["student_id"], []).append(result_data)
+
+    def report(self) -> dict:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": len(self.errors),
+            "errors": sorted(self.errors, key=lambda error: error["line"])
+        }
+
+class BulkUserImport:
+    """Validates uploaded users and creates them in unordered chunks. Each
+    chunk costs one $in duplicate check, one parallel hashing pass over the
+    password hasher's workers and one insert_many."""
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        # student_id -> (line_number, user); ids seen earlier in the upload are duplicates
+        self.pending = {}
+        self.seen = set()
+        self.rows = 0
+        self.created = []
+        self.duplicates = []
+        self.errors = []
+
+    def add_error(self, line_number: int, error: str):
+        self.errors.append({"line": line_number, "error": error})
+
+    def add_duplicate(self, line_number: int, student_id: str):
+        self.duplicates.append({"line": line_number, "student_id": student_id})
+
+    async def add(self, line_number: int, row):
+        self.rows += 1
+        if isinstance(row, str):
+            self.add_error(line_number, row)
+            return
+        try:
+            user = User(**row)
+        except ValidationError as error:
+            self.add_error(line_number, "; ".join(
+                f"{'.'.join(str(part) for part in issue['loc'])}: {issue['msg']}" for issue in error.errors()
+            ))
+            return
+        if not user.password:
+            self.add_error(line_number, "password: Field required")
+            return
+        if user.role not in ("admin", "teacher", "student"):
+            self.add_error(line_number, "role must be admin, teacher or student")
+            return
+        if user.student_id in self.seen:
+            self.add_duplicate(line_number, user.student_id)
+            return
+        
+        self.seen.add(user.student_id)
+        self.pending[user.student_id] = (line_number, user)
+        if len(self.pending) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        pending = self.pending
+        self.pending = {}
+        
+        existing = users_collection.find({"student_id": {"$in": list(pending)}}, {"_id": 0, "student_id": 1})
+        async for user in existing:
+            line_number, _ = pending.pop(user["student_id"])
+            self.add_duplicate(line_number, user["student_id"])
+        if not pending:
+            return
+        
+        line_numbers, users = zip(*pending.values())
+        hashes = await password_hasher.hash_many([user.password for user in users])
+        now = datetime.utcnow()
+        documents = [
+            {
+                "id": str(uuid.uuid4()),
+                "student_id": user.student_id,
+                "name": user.name,
+                "email": user.email,
+                "role": user.role,
+                "password": hashed,
+                "created_at": now
+            }
+            for user, hashed in zip(users, hashes)
+        ]
+        
+        failed = set()
+        try:
+            await users_collection.insert_many(documents, ordered=False)
+        except BulkWriteError as error:
+            for write_error in error.details["writeErrors"]:
+                index = write_error["index"]
+                failed.add(index)
+                # Registered by someone else since the $in check
+                if write_error["code"] == 11000:
+                    self.add_duplicate(line_numbers[index], documents[index]["student_id"])
+                else:
+                    self.add_error(line_numbers[index], write_error["errmsg"])
+        
+        for index, document in enumerate(documents):
+            if index in failed:
+                continue
+            self.created.append({"line": line_numbers[index], "student_id": document["student_id"]})
+            if student_search_index.ready:
+                student_search_index.add(document)
+
+    def report(self) -> dict:
+        return {
+            "rows": self.rows,
+            "created": sorted(self.created, key=lambda row: row["line"]),
+            "duplicates": sorted(self.duplicates, key=lambda row: row["line"]),
+            "failed": sorted(self.errors, key=lambda error: error["line"])
+        }
+
+# Conditional GET
+# Version counters live in the `versions` collection so every worker agrees
+# on them. Write paths bump a counter after writing; readers build a strong
+# ETag from the counters and answer a matching If-None-Match with 304.
+SUBJECTS_VERSION = "subjects"
+
+def student_version_key(student_id: str) -> str:
+    return f"student:{student_id}"
+
+async def read_versions(*keys: str) -> dict:
+    versions = {key: 0 for key in keys}
+    async for document in versions_collection.find({"_id": {"$in": list(keys)}}):
+        versions[document["_id"]] = document["version"]
+    return versions
+
+async def bump_version(key: str):
+    await versions_collection.update_one({"_id": key}, {"$inc": {"version": 1}}, upsert=True)
+
+async def bump_versions(keys):
+    operations = [UpdateOne({"_id": key}, {"$inc": {"version": 1}}, upsert=True) for key in keys]
+    for start in range(0, len(operations), BULK_WRITE_CHUNK_SIZE):
+        await versions_collection.bulk_write(operations[start:start + BULK_WRITE_CHUNK_SIZE], ordered=False)
+
+def if_none_match(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so a W/ prefix still matches
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+# Pagination and streaming
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def encode_cursor(last_key: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"after": last_key}).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["after"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+async def stream_ndjson(cursor):
+    """Yield one JSON line per document straight from a Mongo cursor"""
+    async for document in cursor:
+        yield orjson.dumps(document) + b"\n"
+
+# Results analytics
+def percentage_expression() -> dict:
+    return {"$multiply": [{"$divide": ["$marks", "$max_marks"]}, 100]}
+
+def passed_expression() -> dict:
+    return {"$cond": [{"$ne": ["$grade", grading_scales.active.failing_grade]}, 1, 0]}
+
+def subject_grade_distribution_pipeline() -> List[dict]:
+    return [
+        {"$group": {
+            "_id": {"subject_id": "$subject_id", "grade": "$grade"},
+            "subject_name": {"$first": "$subject_name"},
+            "count": {"$sum": 1},
+            "percentage_total": {"$sum": percentage_expression()}
+        }},
+        {"$group": {
+            "_id": "$_id.subject_id",
+            "subject_name": {"$first": "$subject_name"},
+            "results": {"$sum": "$count"},
+            "percentage_total": {"$sum": "$percentage_total"},
+            "grades": {"$push": {"grade": "$_id.grade", "count": "$count"}}
+        }},
+        {"$sort": {"subject_name": 1}}
+    ]
+
+def subject_semester_marks_pipeline() -> List[dict]:
+    """Mean and median percentage and pass rate per subject and semester.
+    The median is read from the middle of each group's sorted percentages."""
+    return [
+        {"$project": {
+            "subject_id": 1, "subject_name": 1, "year": 1, "semester": 1,
+            "percentage": percentage_expression(),
+            "passed": passed_expression()
+        }},
+        {"$sort": {"percentage": 1}},
+        {"$group": {
+            "_id": {"subject_id": "$subject_id", "year": "$year", "semester": "$semester"},
+            "subject_name": {"$first": "$subject_name"},
+            "results": {"$sum": 1},
+            "passed": {"$sum": "$passed"},
+            "mean_percentage": {"$avg": "$percentage"},
+            "percentages": {"$push": "$percentage"}
+        }},
+        {"$project": {
+            "_id": 0,
+            "subject_id": "$_id.subject_id",
+            "subject_name": 1,
+            "year": "$_id.year",
+            "semester": "$_id.semester",
+            "results": 1,
+            "pass_rate": {"$round": [{"$divide": ["$passed", "$results"]}, 4]},
+            "mean_percentage": {"$round": ["$mean_percentage", 2]},
+            "median_percentage": {"$round": [{"$avg": [
+                {"$arrayElemAt": ["$percentages", {"$floor": {"$divide": [{"$subtract": ["$results", 1]}, 2]}}]},
+                {"$arrayElemAt": ["$percentages", {"$floor": {"$divide": ["$results", 2]}}]}
+            ]}, 2]}
+        }},
+        {"$sort": {"subject_name": 1, "year": 1, "semester": 1}}
+    ]
+
+class ResultsAnalytics:
+    """Institution-wide statistics computed by aggregation pipelines and
+    served from memory. A snapshot is recomputed on demand once it is older
+    than `max_staleness` seconds, or when an admin asks for a refresh, so
+    idle workers run no aggregations."""
+
+    def __init__(self, max_staleness: float, exact_counts: bool):
+        self.max_staleness = max_staleness
+        self.exact_counts = exact_counts
+        self._snapshot = None
+        self._computed_at = None
+        self._lock = asyncio.Lock()
+
+    def is_fresh(self) -> bool:
+        return self._computed_at is not None and time.monotonic() - self._computed_at < self.max_staleness
+
+    async def _counts(self):
+        if self.exact_counts:
+            return await asyncio.gather(
+                users_collection.count_documents({"role": "student"}),
+                subjects_collection.count_documents({}),
+                results_collection.count_documents({})
+            )
+        # Students share the users collection, so they are counted through
+        # the (role, student_id) index; the others come from metadata
+        return await asyncio.gather(
+            users_collection.count_documents({"role": "student"}),
+            subjects_collection.estimated_document_count(),
+            results_collection.estimated_document_count()
+        )
+
+    async def compute(self) -> dict:
+        (total_students, total_subjects, total_results), archived_results, subjects, semesters = await asyncio.gather(
+            self._counts(),
+            archived_result_count(),
+            results_collection.aggregate(
+                [union_archived_results({}), *subject_grade_distribution_pipeline()], allowDiskUse=True
+            ).to_list(length=None),
+            results_collection.aggregate(
+                [union_archived_results({}), *subject_semester_marks_pipeline()], allowDiskUse=True
+            ).to_list(length=None)
+        )
+        total_results += archived_results
+        
+        scale = grading_scales.active
+        grade_distribution = {letter: 0 for letter in scale.grade_points}
+        graded = 0
+        subject_stats = []
+        for subject in subjects:
+            distribution = {letter: 0 for letter in scale.grade_points}
+            for entry in subject["grades"]:
+                distribution[entry["grade"]] = distribution.get(entry["grade"], 0) + entry["count"]
+                grade_distribution[entry["grade"]] = grade_distribution.get(entry["grade"], 0) + entry["count"]
+            graded += subject["results"]
+            subject_stats.append({
+                "subject_id": subject["_id"],
+                "subject_name": subject["subject_name"],
+                "results": subject["results"],
+                "grade_distribution": distribution,
+                "pass_rate": round((subject["results"] - distribution.get(scale.failing_grade, 0)) / subject["results"], 4),
+                "mean_percentage": round(subject["percentage_total"] / subject["results"], 2)
+            })
+        
+        return {
+            "total_students": total_students,
+            "total_subjects": total_subjects,
+            "total_results": total_results,
+            "counts_exact": self.exact_counts,
+            "grade_distribution": grade_distribution,
+            "pass_rate": round((graded - grade_distribution.get(scale.failing_grade, 0)) / graded, 4) if graded else 0.0,
+            "subjects": subject_stats,
+            "semesters": semesters,
+            "generated_at": datetime.utcnow()
+        }
+
+    def invalidate(self):
+        self._computed_at = None
+
+    async def refresh(self) -> dict:
+        async with self._lock:
+            self._snapshot = await self.compute()
+            self._computed_at = time.monotonic()
+            return self._snapshot
+
+    async def get(self) -> dict:
+        if self.is_fresh():
+            return self._snapshot
+        async with self._lock:
+            # Another request may have refreshed while we waited for the lock
+            if self.is_fresh():
+                return self._snapshot
+            self._snapshot = await self.compute()
+            self._computed_at = time.monotonic()
+            return self._snapshot
+
+results_analytics = ResultsAnalytics(ANALYTICS_MAX_STALENESS, ANALYTICS_EXACT_COUNTS)
+
+# Result event broker
+class ResultSubscription:
+    def __init__(self, topics: List[str], queue_size: int):
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+class ResultBroker:
+    """In-process fan-out of result deltas to open event streams. Clients
+    subscribe to "student:<student_id>" or "subject:<subject_id>" topics;
+    each event carries the changed results and the student's updated GPAs.
+
+    Events are published by the write handlers, or, when the cache
+    invalidation bus follows change streams, from the bus so writes made by
+    any worker reach every worker's subscribers. A subscriber that falls
+    `queue_size` events behind is disconnected and refetches on reconnect.
+
+    Results seen on the change stream are held until the student's summary
+    changes, so the event carries the new GPAs. Writes that leave the
+    summary alone are sent without GPAs after `hold_timeout` seconds, and
+    at most `hold_max` results are held at once."""
+
+    def __init__(self, queue_size: int, hold_timeout: float, hold_max: int):
+        self.queue_size = queue_size
+        self.hold_timeout = hold_timeout
+        self.hold_max = hold_max
+        self.subscriptions = set()
+        self._topics = {}
+        # student_id -> held results, students in the order their first result was held
+        self._held = OrderedDict()
+        self._held_count = 0
+
+    def subscribe(self, topics: List[str]) -> ResultSubscription:
+        subscription = ResultSubscription(topics, self.queue_size)
+        self.subscriptions.add(subscription)
+        for topic in topics:
+            self._topics.setdefault(topic, set()).add(subscription)
+        cache_invalidation_bus.follow_results(True)
+        return subscription
+
+    def unsubscribe(self, subscription: ResultSubscription):
+        self.subscriptions.discard(subscription)
+        for topic in subscription.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[topic]
+        cache_invalidation_bus.follow_results(bool(self.subscriptions))
+
+    def is_watched(self, result: dict) -> bool:
+        return f"student:{result['student_id']}" in self._topics or f"subject:{result['subject_id']}" in self._topics
+
+    @property
+    def publishes_locally(self) -> bool:
+        # Until the bus reopens its stream with results, writes are published
+        # here; the reopened stream may replay a few of them, which clients
+        # apply idempotently
+        return cache_invalidation_bus.mode != "change_streams" or not cache_invalidation_bus.following_results
+
+    def _send(self, topic: str, event: dict):
+        subscribers = self._topics.get(topic)
+        if not subscribers:
+            return
+        data = orjson.dumps(event)
+        for subscription in list(subscribers):
+            try:
+                subscription.queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # Too far behind: end the stream so the client reconnects and refetches
+                self.unsubscribe(subscription)
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(None)
+
+    def publish(self, student_id: str, results: List[dict], summary: Optional[dict]):
+        """Send a delta for one student's changed results to the student's
+        subscribers, and each subject's share of it to the subject's"""
+        gpas = gpas_from_summary(summary) if summary else {}
+        self._send(f"student:{student_id}", {"student_id": student_id, "results": results, **gpas})
+        for subject_id in {result["subject_id"] for result in results}:
+            self._send(f"subject:{subject_id}", {
+                "student_id": student_id,
+                "results": [result for result in results if result["subject_id"] == subject_id],
+                **gpas
+            })
+
+    def hold(self, result: dict):
+        """Keep a result from the change stream until its summary changes"""
+        if not self.is_watched(result):
+            return
+        result = {key: value for key, value in result.items() if key != "_id"}
+        results = self._held.get(result["student_id"])
+        if results is None:
+            results = self._held[result["student_id"]] = []
+            asyncio.get_running_loop().call_later(self.hold_timeout, self._send_held, result["student_id"], results)
+        results.append(result)
+        self._held_count += 1
+        while self._held_count > self.hold_max:
+            student_id, oldest = next(iter(self._held.items()))
+            self._send_held(student_id, oldest)
+
+    def _send_held(self, student_id: str, results: List[dict]):
+        """Send held results whose summary change never came, e.g. a rename
+        or a regrade that kept the grade"""
+        if self._held.get(student_id) is results:
+            del self._held[student_id]
+            self._held_count -= len(results)
+            self.publish(student_id, results, None)
+
+    def release(self, summary: dict):
+        results = self._held.pop(summary["student_id"], None)
+        if results:
+            self._held_count -= len(results)
+            self.publish(summary["student_id"], results, summary)
+
+result_broker = ResultBroker(RESULT_STREAM_QUEUE_SIZE, RESULT_STREAM_HOLD_TIMEOUT, RESULT_STREAM_HOLD_MAX)
+
+async def stream_result_events(topics: List[str], keepalive: float):
+    """Server-sent events for the topics, with comment keepalives"""
+    subscription = result_broker.subscribe(topics)
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                data = await asyncio.wait_for(subscription.queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if data is None:
+                break
+            yield b"event: results\ndata: " + data + b"\n\n"
+    finally:
+        result_broker.unsubscribe(subscription)
+
+# Cache invalidation bus
+cache_invalidation_logger = logging.getLogger("student_results.cache_invalidation")
+
+# "$changeStream is only supported on replica sets" and friends
+CHANGE_STREAMS_UNSUPPORTED_CODES = {40573, 40324}
+# The resume token fell out of the oplog, so events may have been missed
+CHANGE_STREAM_HISTORY_LOST_CODES = {286, 280, 260}
+
+class CacheInvalidationBus:
+    """Keeps the in-process caches of every worker coherent by following one
+    database change stream over users, subjects, results, summaries and
+    grading scales, and evicting what each change affects. After a
+    disconnect the stream resumes from the last token; when change streams
+    are unavailable the bus stops and caches fall back to expiring by their
+    TTLs.
+
+    Result changes only feed event streams, so results are followed only
+    while this worker has subscribers; the stream is reopened from the last
+    token when that changes."""
+
+    def __init__(self, retry_delay: float):
+        self.retry_delay = retry_delay
+        self.mode = "ttl"
+        self.resume_token = None
+        self.following_results = False
+        self._pipeline_changed = False
+        self._task = None
+
+    def pipeline(self) -> List[dict]:
+        collections = [users_collection.name, subjects_collection.name,
+                       student_summaries_collection.name, grading_scales_collection.name]
+        if self.following_results:
+            collections.append(results_collection.name)
+        return [{"$match": {"$or": [
+            {"ns.coll": {"$in": collections}},
+            {"operationType": {"$in": ["dropDatabase", "invalidate"]}}
+        ]}}]
+
+    def follow_results(self, follow: bool):
+        """Reopen the stream with or without results once it is idle"""
+        if follow != self.following_results:
+            self._pipeline_changed = True
+
+    async def flush(self):
+        """Evict everything, for when changes may have been missed"""
+        principal_cache.invalidate()
+        subject_catalogue.invalidate()
+        results_analytics.invalidate()
+        await rank_index.rebuild()
+
+    async def apply(self, change: dict):
+        collection = change.get("ns", {}).get("coll")
+        document = change.get("fullDocument")
+        if collection is None:
+            await self.flush()
+        elif collection == users_collection.name:
+            # Deletes only carry the _id, so they evict every principal
+            principal_cache.invalidate(document["id"] if document else None)
+            if not student_search_index.ready:
+                pass
+            elif document:
+                student_search_index.add(document)
+            else:
+                await student_search_index.rebuild()
+        elif collection == subjects_collection.name:
+            # A new subject must show up in all(), so reload the whole catalogue
+            subject_catalogue.invalidate()
+        elif collection == results_collection.name:
+            # Analytics are left to ANALYTICS_MAX_STALENESS; evicting them on
+            # every result write would rerun the full aggregations per poll
+            if document:
+                result_broker.hold(document)
+        elif collection == student_summaries_collection.name:
+            if document:
+                rank_index.update_student(document)
+                result_broker.release(document)
+            elif change["operationType"] in ("delete", "drop"):
+                await rank_index.rebuild()
+        elif collection == grading_scales_collection.name:
+            await grading_scales.refresh()
+
+    async def apply_safely(self, change: dict):
+        """apply() one change; a bad event must not stop the stream"""
+        try:
+            await self.apply(change)
+        except PyMongoError:
+            raise
+        except Exception:
+            cache_invalidation_logger.exception("Could not apply %s change on %s", change.get("operationType"),
+                                                change.get("ns", {}).get("coll"))
+            await self.flush()
+
+    async def _watch(self):
+        try:
+            await self._follow()
+        except Exception:
+            cache_invalidation_logger.exception("Cache invalidation stopped; caches expire by TTL only")
+        finally:
+            # However the stream ends, caches are back to expiring by TTL
+            self.mode = "ttl"
+
+    async def _follow(self):
+        while True:
+            try:
+                self.following_results = bool(result_broker.subscriptions)
+                self._pipeline_changed = False
+                async with db.watch(self.pipeline(), full_document="updateLookup",
+                                    resume_after=self.resume_token) as stream:
+                    if self.mode == "reconnecting" and self.resume_token is None:
+                        await self.flush()
+                    self.mode = "change_streams"
+                    self.resume_token = stream.resume_token
+                    while stream.alive and not self._pipeline_changed:
+                        # try_next also advances the token on empty batches
+                        change = await stream.try_next()
+                        if change is not None:
+                            await self.apply_safely(change)
+                        self.resume_token = stream.resume_token
+                if self._pipeline_changed:
+                    continue
+            except OperationFailure as error:
+                if error.code in CHANGE_STREAMS_UNSUPPORTED_CODES:
+                    cache_invalidation_logger.info("Change streams unavailable (%s); caches expire by TTL only", error)
+                    self.mode = "ttl"
+                    return
+                if error.code in CHANGE_STREAM_HISTORY_LOST_CODES:
+                    self.resume_token = None
+                cache_invalidation_logger.warning("Change stream failed, retrying: %s", error)
+            except PyMongoError as error:
+                cache_invalidation_logger.warning("Change stream disconnected, resuming: %s", error)
+            self.mode = "reconnecting"
+            await asyncio.sleep(self.retry_delay)
+
+    def start(self):
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.mode = "ttl"
+        self.following_results = False
+
+cache_invalidation_bus = CacheInvalidationBus(CACHE_INVALIDATION_RETRY_DELAY)
+
+@app.on_event("startup")
+async def start_cache_invalidation_bus():
+    if CACHE_INVALIDATION_ENABLED:
+        cache_invalidation_bus.start()
+
+@app.on_event("shutdown")
+async def stop_cache_invalidation_bus():
+    await cache_invalidation_bus.stop()
+
+# Background jobs
+# Policy changes -- a new grading scale, new subject credits -- are applied
+# to stored results by jobs kept in `jobs`, shaped as
+# {id, type, params, status, phase, cursor, progress: {phase: {processed, total, updated}}}.
+# Any worker may claim a queued job. The cursor and progress are saved after
+# every chunk, so a job whose worker stopped (its heartbeat went stale) is
+# claimed again and resumes after its last finished chunk.
+job_logger = logging.getLogger("student_results.jobs")
+
+# Fields of a job document that are internal to the runner
+JOB_PROJECTION = {"_id": 0, "cursor": 0}
+
+class JobLost(Exception):
+    """Another worker claimed the job after this worker's heartbeat went stale"""
+
+class JobRunner:
+    """Claims background jobs and runs them one at a time, a chunk at a time,
+    so the API keeps serving requests while large collections are rewritten.
+    Handlers are registered per job type with @job_runner.handler(type)."""
+
+    # Shared by every runner: a job may be claimed by any worker
+    handlers = {}
+
+    def __init__(self, chunk_size: int, poll_interval: float, stale_after: float):
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.worker_id = str(uuid.uuid4())
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def handler(self, job_type: str):
+        def register(function):
+            self.handlers[job_type] = function
+            return function
+        return register
+
+    async def enqueue(self, job_type: str, params: dict) -> dict:
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "type": job_type,
+            "params": params,
+            "status": "queued",
+            "phase": None,
+            "cursor": None,
+            "progress": {},
+            "error": None,
+            "worker": None,
+            "heartbeat_at": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        await jobs_collection.insert_one(job)
+        self.wake()
+        return {key: value for key, value in job.items() if key not in JOB_PROJECTION}
+
+    def wake(self):
+        """Look for work now instead of at the next poll"""
+        self._wake.set()
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await jobs_collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "running", "heartbeat_at": {"$lt": now - timedelta(seconds=self.stale_after)}}
+            ]},
+            {"$set": {"status": "running", "worker": self.worker_id, "heartbeat_at": now, "updated_at": now}},
+            sort=[("created_at", pymongo.ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def save(self, job: dict, **fields):
+        """Checkpoint a running job. Raises JobLost when this worker no longer owns it."""
+        now = datetime.utcnow()
+        job.update(fields)
+        outcome = await jobs_collection.update_one(
+            {"id": job["id"], "worker": self.worker_id, "status": "running"},
+            {"$set": {**fields, "heartbeat_at": now, "updated_at": now}}
+        )
+        if outcome.matched_count == 0:
+            raise JobLost(job["id"])
+
+    async def start_phase(self, job: dict, phase: str, total: int):
+        progress = {**job["progress"], phase: {"processed": 0, "updated": 0, "total": total}}
+        await self.save(job, phase=phase, cursor=None, progress=progress)
+
+    async def advance(self, job: dict, cursor, processed: int, updated: int = 0):
+        """Record a finished chunk; the job resumes after `cursor`"""
+        counts = job["progress"][job["phase"]]
+        progress = {**job["progress"], job["phase"]: {
+            **counts, "processed": counts["processed"] + processed, "updated": counts["updated"] + updated
+        }}
+        await self.save(job, cursor=cursor, progress=progress)
+
+    async def run(self, job: dict):
+        try:
+            await self.handlers[job["type"]](self, job)
+            if job["status"] == "running":
+                await self.save(job, status="completed", finished_at=datetime.utcnow())
+        except JobLost:
+            job_logger.warning("Job %s was claimed by another worker", job["id"])
+        except Exception as error:
+            job_logger.exception("Job %s failed", job["id"])
+            await jobs_collection.update_one(
+                {"id": job["id"], "worker": self.worker_id},
+                {"$set": {"status": "failed", "error": str(error), "updated_at": datetime.utcnow()}}
+            )
+
+    async def _run_jobs(self):
+        while True:
+            self._wake.clear()
+            try:
+                job = await self.claim()
+            except PyMongoError as error:
+                job_logger.warning("Could not claim a job: %s", error)
+                job = None
+            if job is not None:
+                await self.run(job)
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self._task = asyncio.create_task(self._run_jobs())
+
+    async def stop(self):
+        # An interrupted job stays "running" and is resumed once it goes stale
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+job_runner = JobRunner(JOB_CHUNK_SIZE, JOB_POLL_INTERVAL, JOB_STALE_AFTER)
+
+async def regrade_results(scale: GradingScale, results: List[dict]) -> int:
+    """Grade a chunk of results under `scale` with one bulk write and rebuild
+    the summaries of students whose grades moved. Returns how many moved."""
+    grades, _ = scale.grades([result["marks"] for result in results],
+                             [result["max_marks"] for result in results])
+    operations = []
+    changed_students = set()
+    changed = 0
+    for result, grade in zip(results, grades.tolist()):
+        # Matching the marks leaves results rewritten since they were read
+        # alone, and the version check results a newer scale's job graded
+        operations.append(UpdateOne(
+            {"_id": result["_id"], "marks": result["marks"], "max_marks": result["max_marks"],
+             "scale_version": {"$not": {"$gte": scale.version}}},
+            {"$set": {"grade": grade, "scale_version": scale.version}}
+        ))
+        if grade != result.get("grade"):
+            changed_students.add(result["student_id"])
+            changed += 1
+    await results_collection.bulk_write(operations, ordered=False)
+    if changed_students:
+        student_ids = sorted(changed_students)
+        await rebuild_student_summaries(student_ids)
+        await bump_versions([student_version_key(student_id) for student_id in student_ids])
+    return changed
+
+async def rebuild_summary_chunks(runner: JobRunner, job: dict, student_ids: List[str], rebuild: bool = True):
+    """Rebuild (or only re-version) the summaries of sorted student_ids a
+    chunk at a time, resuming after the job's cursor"""
+    if job["cursor"] is not None:
+        student_ids = student_ids[bisect.bisect_right(student_ids, job["cursor"]):]
+    for start in range(0, len(student_ids), runner.chunk_size):
+        chunk = student_ids[start:start + runner.chunk_size]
+        if rebuild:
+            await rebuild_student_summaries(chunk)
+        await bump_versions([student_version_key(student_id) for student_id in chunk])
+        await runner.advance(job, chunk[-1], len(chunk))
+
+# Version of the grading scale whose grade points every summary was last
+# rebuilt with, kept with the other counters in `versions`
+SUMMARY_SCALE_VERSION = "summary_scale"
+
+async def scale_superseded(scale: GradingScale) -> bool:
+    """A newer scale exists; its own job re-grades everything"""
+    return (await grading_scales.refresh()).version > scale.version
+
+async def summaries_need_rebuild(scale: GradingScale) -> bool:
+    """Whether summaries were built with other grade points than `scale`'s.
+    Comparing with the scale they were built with, not the previous one,
+    keeps point changes from a superseded scale from being lost."""
+    built_with = (await read_versions(SUMMARY_SCALE_VERSION))[SUMMARY_SCALE_VERSION] or grading_scales.default.version
+    previous = await grading_scales.get(built_with)
+    return previous is None or previous.grade_points != scale.grade_points
+
+async def mark_summaries_built_with(scale: GradingScale):
+    await versions_collection.update_one(
+        {"_id": SUMMARY_SCALE_VERSION}, {"$max": {"version": scale.version}}, upsert=True
+    )
+
+@job_runner.handler("regrade")
+async def run_regrade_job(runner: JobRunner, job: dict):
+    """Re-grade open-year results graded under an older scale version, then
+    rebuild every summary if they were built with other grade points.
+    Archived years keep the grades they were frozen with."""
+    scale = await grading_scales.get(job["params"]["version"])
+    if scale is None or await scale_superseded(scale):
+        await runner.save(job, status="superseded", finished_at=datetime.utcnow())
+        return
+    
+    archived_years = await archived_years_collection.distinct("year")
+    query = {"scale_version": {"$not": {"$gte": scale.version}}, "year": {"$nin": archived_years}}
+    if job["phase"] is None:
+        await runner.start_phase(job, "grades", await results_collection.count_documents(query))
+    if job["phase"] == "grades":
+        while True:
+            # Another worker may be running a newer scale's job alongside this one
+            if await scale_superseded(scale):
+                await runner.save(job, status="superseded", finished_at=datetime.utcnow())
+                return
+            chunk_query = dict(query)
+            if job["cursor"] is not None:
+                chunk_query["_id"] = {"$gt": job["cursor"]}
+            results = await results_collection.find(
+                chunk_query, {"_id": 1, "student_id": 1, "marks": 1, "max_marks": 1, "grade": 1}
+            ).sort("_id", pymongo.ASCENDING).limit(runner.chunk_size).to_list(length=None)
+            if not results:
+                if job["cursor"] is None:
+                    break
+                # Workers that have not loaded this scale yet may have written
+                # older grades behind the cursor; sweep again until none are left
+                await runner.save(job, cursor=None)
+                continue
+            await runner.advance(job, results[-1]["_id"], len(results), await regrade_results(scale, results))
+        if not await summaries_need_rebuild(scale):
+            await mark_summaries_built_with(scale)
+            return
+        await runner.start_phase(job, "summaries", await users_collection.count_documents({"role": "student"}))
+    
+    student_ids = [user["student_id"] async for user in users_collection.find(
+        {"role": "student"}, {"_id": 0, "student_id": 1}
+    ).sort("student_id", pymongo.ASCENDING)]
+    await rebuild_summary_chunks(runner, job, student_ids)
+    await mark_summaries_built_with(scale)
+    results_analytics.invalidate()
+
+@job_runner.handler("subject_update")
+async def run_subject_update_job(runner: JobRunner, job: dict):
+    """Carry a subject edit into its open-year results: the copied
+    subject_name, and for new credits the affected students' summaries"""
+    subject = await subjects_collection.find_one({"id": job["params"]["subject_id"]}, {"_id": 0})
+    if subject is None:
+        return
+    archived_years = await archived_years_collection.distinct("year")
+    subject_results = {"subject_id": subject["id"], "year": {"$nin": archived_years}}
+    student_ids = sorted(await results_collection.distinct("student_id", subject_results))
+    if job["phase"] is None:
+        await results_collection.update_many(
+            {**subject_results, "subject_name": {"$ne": subject["name"]}}, {"$set": {"subject_name": subject["name"]}}
+        )
+        await runner.start_phase(job, "summaries", len(student_ids))
+    # Only credits feed into summaries; a rename just changes the transcripts
+    await rebuild_summary_chunks(runner, job, student_ids, rebuild=job["params"]["credits_changed"])
+
+@app.on_event("startup")
+async def start_job_runner():
+    if JOB_RUNNER_ENABLED:
+        job_runner.start()
+
+@app.on_event("shutdown")
+async def stop_job_runner():
+    await job_runner.stop()
+
+# Cohort export
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": NDJSON_MEDIA_TYPE, "parquet": "application/vnd.apache.parquet"}
+EXPORT_COLUMNS = [
+    "student_id", "student_name", "subject_id", "subject_code", "subject_name", "credits",
+    "year", "semester", "marks", "max_marks", "percentage", "grade", "grade_points",
+    "semester_gpa", "overall_gpa"
+]
+
+def export_filter(cohort: Optional[str], year: Optional[str], semester: Optional[str]) -> dict:
+    """Cohorts are student_id prefixes, e.g. "ST2024" for that intake"""
+    query = {}
+    if cohort:
+        query["student_id"] = {"$regex": "^" + re.escape(cohort)}
+    if year:
+        query["year"] = year
+    if semester:
+        query["semester"] = semester
+    return query
+
+async def export_rows(results: List[dict], subjects: dict) -> List[dict]:
+    """Flatten a batch of results into export rows, looking up names and
+    GPA summaries for the whole batch with one $in query each"""
+    student_ids = list({result["student_id"] for result in results})
+    users, summaries = await asyncio.gather(
+        users_collection.find({"student_id": {"$in": student_ids}}, {"_id": 0, "student_id": 1, "name": 1})
+        .to_list(length=None),
+        student_summaries_collection.find({"student_id": {"$in": student_ids}}, {"_id": 0})
+        .to_list(length=None)
+    )
+    names = {user["student_id"]: user["name"] for user in users}
+    summaries = {summary["student_id"]: summary for summary in summaries}
+    scale = grading_scales.active
+    
+    rows = []
+    for result in results:
+        subject = subjects.get(result["subject_id"], {})
+        summary = summaries.get(result["student_id"])
+        semester = None
+        if summary is not None:
+            semester = summary["semesters"].get(summary_semester_field(result["year"], result["semester"]))
+        rows.append({
+            "student_id": result["student_id"],
+            "student_name": names.get(result["student_id"]),
+            "subject_id": result["subject_id"],
+            "subject_code": subject.get("code"),
+            "subject_name": subject.get("name", result.get("subject_name")),
+            "credits": subject.get("credits", DEFAULT_CREDITS),
+            "year": result["year"],
+            "semester": result["semester"],
+            "marks": float(result["marks"]),
+            "max_marks": float(result["max_marks"]),
+            "percentage": round(result["marks"] / result["max_marks"] * 100, 2),
+            "grade": result["grade"],
+            "grade_points": scale.points(result["grade"]),
+            "semester_gpa": gpa_from_totals(semester["points"], semester["credits"]) if semester else None,
+            "overall_gpa": gpa_from_totals(summary["total_points"], summary["total_credits"]) if summary else None
+        })
+    return rows
+
+async def iter_export_batches(query: dict, batch_size: int):
+    """Yield lists of export rows, holding one batch of results at a time.
+
+    Live results come first, then archived ones, each sorted by student_id so
+    a batch covers few students; there is no overall order across the two."""
+    subjects = await subject_catalogue.all()
+    cursor = results_collection.aggregate([
+        {"$match": query},
+        {"$project": {"_id": 0}},
+        {"$sort": {"student_id": 1}},
+        {"$unionWith": {"coll": result_archives_collection.name, "pipeline": [
+            {"$sort": {"student_id": 1}},
+            *archived_results_stages(query)
+        ]}}
+    ], batchSize=batch_size, allowDiskUse=True)
+    batch = []
+    async for result in cursor:
+        batch.append(result)
+        if len(batch) >= batch_size:
+            yield await export_rows(batch, subjects)
+            batch = []
+    if batch:
+        yield await export_rows(batch, subjects)
+
+async def export_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    async for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+async def export_ndjson(batches):
+    async for rows in batches:
+        yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+class ExportSink:
+    """Write-only file object that hands over Parquet bytes as they are
+    written; tell() keeps counting so the footer offsets stay correct"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def export_parquet_schema():
+    return pyarrow.schema([
+        ("student_id", pyarrow.string()), ("student_name", pyarrow.string()),
+        ("subject_id", pyarrow.string()), ("subject_code", pyarrow.string()),
+        ("subject_name", pyarrow.string()), ("credits", pyarrow.float64()),
+        ("year", pyarrow.string()), ("semester", pyarrow.string()),
+        ("marks", pyarrow.float64()), ("max_marks", pyarrow.float64()),
+        ("percentage", pyarrow.float64()), ("grade", pyarrow.string()),
+        ("grade_points", pyarrow.float64()), ("semester_gpa", pyarrow.float64()),
+        ("overall_gpa", pyarrow.float64())
+    ])
+
+async def export_parquet(batches):
+    """One row group per batch, streamed as soon as it is written"""
+    schema = export_parquet_schema()
+    sink = ExportSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    async for rows in batches:
+        writer.write_table(pyarrow.Table.from_pylist(rows, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+EXPORT_ENCODERS = {"csv": export_csv, "ndjson": export_ndjson, "parquet": export_parquet}
 
 # API Routes
 
 @app.get("/api/health")
-def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow()}
+async def health_check():
+    return {"status": "healthy", "timestamp": datetime.utcnow(), "cache_invalidation": cache_invalidation_bus.mode}
+
+@app.get("/api/metrics")
+async def get_metrics(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    if not (METRICS_TOKEN and hmac.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode())):
+        current_user = await get_current_user(credentials)
+        if current_user["role"] not in ["admin"]:
+            raise HTTPException(status_code=403, detail="Permission denied")
+    
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.post("/api/auth/register")
-def register_user(user: User):
+async def register_user(user: User):
     # Check if user exists
-    existing_user = users_collection.find_one({"student_id": user.student_id})
+    existing_user = await users_collection.find_one({"student_id": user.student_id})
     if existing_user:
         raise HTTPException(status_code=400, detail="Student ID already exists")
     
@@ -157,39 +2960,62 @@ def register_user(user: User):
         "name": user.name,
         "email": user.email,
         "role": user.role,
-        "password": hash_password(user.password),
+        "password": await password_hasher.hash(user.password),
         "created_at": datetime.utcnow()
     }
     
-    result = users_collection.insert_one(user_data)
+    try:
+        await users_collection.insert_one(user_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Student ID already exists")
+    if student_search_index.ready:
+        student_search_index.add(user_data)
     user_data.pop("password", None)  # Remove password from response
     user_data.pop("_id", None)  # Remove MongoDB ObjectId
     return {"message": "User registered successfully", "user": user_data}
 
+@app.post("/api/auth/register/bulk")
+async def bulk_register_users(request: Request, upload_format: Optional[str] = Query(None, alias="format"),
+                              current_user: dict = Depends(get_current_user)):
+    """Create users from a streamed CSV (with a header row) or NDJSON body of
+    User rows. Existing student ids are skipped and reported as duplicates."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    upload_format = upload_format or BULK_UPLOAD_FORMATS.get(content_type)
+    if upload_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=415, detail="Upload must be text/csv or application/x-ndjson")
+    
+    importer = BulkUserImport(BULK_WRITE_CHUNK_SIZE)
+    async for line_number, row in iter_upload_rows(request, upload_format):
+        await importer.add(line_number, row)
+    await importer.flush()
+    
+    return {"message": "Bulk registration completed", **importer.report()}
+
 @app.post("/api/auth/login")
-def login_user(login_data: UserLogin):
-    user = users_collection.find_one({"student_id": login_data.student_id})
-    if not user or not verify_password(login_data.password, user["password"]):
+async def login_user(login_data: UserLogin):
+    user = await users_collection.find_one({"student_id": login_data.student_id})
+    if not user or not await password_hasher.verify(login_data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    token = create_access_token({"user_id": user["id"], "role": user["role"]})
+    token = create_access_token({"user_id": user["id"], "role": user["role"], "student_id": user["student_id"]})
     user.pop("password", None)  # Remove password from response
     user.pop("_id", None)  # Remove MongoDB ObjectId
     return {"access_token": token, "token_type": "bearer", "user": user}
 
 @app.get("/api/auth/me")
-def get_current_user_info(current_user: dict = Depends(get_current_user)):
-    current_user.pop("password", None)
-    current_user.pop("_id", None)
+async def get_current_user_info(current_user: dict = Depends(get_current_user_profile)):
     return current_user
 
 @app.post("/api/subjects")
-def create_subject(subject: Subject, current_user: dict = Depends(get_current_user)):
+async def create_subject(subject: Subject, current_user: dict = Depends(get_current_user)):
     if current_user["role"] not in ["admin"]:
         raise HTTPException(status_code=403, detail="Permission denied")
     
     # Check if subject code exists
-    existing_subject = subjects_collection.find_one({"code": subject.code})
+    existing_subject = await subjects_collection.find_one({"code": subject.code})
     if existing_subject:
         raise HTTPException(status_code=400, detail="Subject code already exists")
     
@@ -201,42 +3027,138 @@ def create_subject(subject: Subject, current_user: dict = Depends(get_current_us
         "created_at": datetime.utcnow()
     }
     
-    result = subjects_collection.insert_one(subject_data)
+    try:
+        await subjects_collection.insert_one(subject_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Subject code already exists")
+    
+    subject_catalogue.invalidate()
+    await bump_version(SUBJECTS_VERSION)
     subject_data.pop("_id", None)  # Remove MongoDB ObjectId
     return {"message": "Subject created successfully", "subject": subject_data}
 
 @app.get("/api/subjects")
-def get_subjects():
-    subjects = list(subjects_collection.find({}, {"_id": 0}))
-    return {"subjects": subjects}
+async def get_subjects(request: Request):
+    versions = await read_versions(SUBJECTS_VERSION)
+    etag = f'"subjects-{versions[SUBJECTS_VERSION]}"'
+    if if_none_match(request, etag):
+        return not_modified(etag, SUBJECTS_CACHE_CONTROL)
+    
+    subjects = await subjects_collection.find({}, {"_id": 0}).to_list(length=None)
+    return FastJSONResponse({"subjects": subjects}, headers={"ETag": etag, "Cache-Control": SUBJECTS_CACHE_CONTROL})
+
+@app.put("/api/subjects/{subject_id}")
+async def update_subject(subject_id: str, update: SubjectUpdate, current_user: dict = Depends(get_current_user)):
+    """Edit a subject. Name and credit changes reach stored results and GPA
+    summaries through a background job, returned as `job`."""
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    changes = update.model_dump(exclude_none=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="No changes given")
+    if changes.get("credits", 1) <= 0:
+        raise HTTPException(status_code=400, detail="Credits must be greater than zero")
+    
+    try:
+        previous = await subjects_collection.find_one_and_update(
+            {"id": subject_id},
+            {"$set": {**changes, "updated_at": datetime.utcnow()}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Subject code already exists")
+    if previous is None:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    
+    subject_catalogue.invalidate()
+    await bump_version(SUBJECTS_VERSION)
+    subject = {**previous, **changes}
+    name_changed = subject["name"] != previous["name"]
+    credits_changed = subject.get("credits", DEFAULT_CREDITS) != previous.get("credits", DEFAULT_CREDITS)
+    job = None
+    if name_changed or credits_changed:
+        job = await job_runner.enqueue("subject_update", {"subject_id": subject_id, "credits_changed": credits_changed})
+    return {"message": "Subject updated successfully", "subject": subject, "job": job}
+
+@app.get("/api/grading-scales")
+async def get_grading_scales(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    scales = await grading_scales_collection.find({}, {"_id": 0}).sort("version", pymongo.DESCENDING).to_list(length=None)
+    return {"active_version": grading_scales.active.version, "scales": scales}
+
+@app.post("/api/grading-scales")
+async def create_grading_scale(scale: GradingScaleInput, current_user: dict = Depends(get_current_user)):
+    """Activate a new grading scale version. Stored results are re-graded by
+    a background job, returned as `job`."""
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    created = await grading_scales.create(scale, current_user["id"])
+    results_analytics.invalidate()
+    job = await job_runner.enqueue("regrade", {"version": created.version})
+    return {"message": "Grading scale created successfully", "scale": created.to_document(), "job": job}
+
+@app.get("/api/jobs")
+async def get_jobs(limit: int = Query(50, ge=1, le=500), current_user: dict = Depends(get_current_user)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    jobs = await jobs_collection.find({}, JOB_PROJECTION).sort("created_at", pymongo.DESCENDING).limit(limit).to_list(length=None)
+    return {"jobs": jobs}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    job = await jobs_collection.find_one({"id": job_id}, JOB_PROJECTION)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/api/jobs/{job_id}/retry")
+async def retry_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Queue a failed job again; it resumes after its last finished chunk"""
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    job = await jobs_collection.find_one_and_update(
+        {"id": job_id, "status": "failed"},
+        {"$set": {"status": "queued", "error": None, "updated_at": datetime.utcnow()}},
+        projection=JOB_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    if not job:
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried")
+    job_runner.wake()
+    return {"message": "Job queued", "job": job}
 
 @app.post("/api/results")
-def add_result(result: ResultInput, current_user: dict = Depends(get_current_user)):
+async def add_result(result: ResultInput, current_user: dict = Depends(get_current_user)):
     if current_user["role"] not in ["admin", "teacher"]:
         raise HTTPException(status_code=403, detail="Permission denied")
     
     # Verify student exists
-    student = users_collection.find_one({"student_id": result.student_id})
+    student = await users_collection.find_one({"student_id": result.student_id})
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
     # Verify subject exists
-    subject = subjects_collection.find_one({"id": result.subject_id})
+    subject = await subject_catalogue.get(result.subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
+    if await is_year_archived(result.year):
+        raise HTTPException(status_code=409, detail=f"Results for {result.year} are archived and read-only")
     
-    # Check if result already exists for this student, subject, semester, year
-    existing_result = results_collection.find_one({
-        "student_id": result.student_id,
-        "subject_id": result.subject_id,
-        "semester": result.semester,
-        "year": result.year
-    })
-    
-    grade = calculate_grade(result.marks, result.max_marks)
+    scale = grading_scales.active
+    grade = scale.grade(result.marks, result.max_marks)
+    now = datetime.utcnow()
     
     result_data = {
-        "id": str(uuid.uuid4()),
         "student_id": result.student_id,
         "subject_id": result.subject_id,
         "subject_name": subject["name"],
@@ -245,91 +3167,303 @@ def add_result(result: ResultInput, current_user: dict = Depends(get_current_use
         "semester": result.semester,
         "year": result.year,
         "grade": grade,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
+        "scale_version": scale.version,
+        "updated_at": now
     }
     
+    # Single atomic upsert on (student_id, subject_id, semester, year); the
+    # pre-image tells us whether this was an insert or an update in place
+    result_filter, result_update = build_result_upsert(result_data, now)
+    try:
+        existing_result = await results_collection.find_one_and_update(
+            result_filter, result_update, upsert=True, return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        # A concurrent writer inserted the same key first; retry as an update
+        existing_result = await results_collection.find_one_and_update(
+            result_filter, result_update, upsert=True, return_document=ReturnDocument.BEFORE
+        )
+    
+    # Fold the change into the student's GPA summary; an update in place only
+    # moves the grade points, an insert also adds credits and a subject
+    credits = subject.get("credits", DEFAULT_CREDITS)
+    points = scale.points(grade) * credits
     if existing_result:
-        # Update existing result
-        results_collection.update_one(
-            {"id": existing_result["id"]},
-            {"$set": {**result_data, "id": existing_result["id"]}}
+        previous_points = scale.points(existing_result["grade"]) * credits
+        summary = await apply_result_to_summary(
+            result.student_id, result.year, result.semester, 0, points - previous_points, 0
         )
-        result_data["id"] = existing_result["id"]
-        result_data.pop("_id", None)
-        return {"message": "Result updated successfully", "result": result_data}
     else:
-        # Create new result
-        results_collection.insert_one(result_data)
-        result_data.pop("_id", None)
-        return {"message": "Result added successfully", "result": result_data}
+        summary = await apply_result_to_summary(result.student_id, result.year, result.semester, credits, points, 1)
+    await bump_version(student_version_key(result.student_id))
+    
+    if existing_result:
+        result_data = {"id": existing_result["id"], **result_data, "created_at": existing_result.get("created_at", now)}
+    else:
+        result_data = {**result_update["$setOnInsert"], **result_data}
+    if result_broker.publishes_locally:
+        result_broker.publish(result.student_id, [result_data], summary)
+    
+    if existing_result:
+        return {"message": "Result updated successfully", "result": result_data}
+    return {"message": "Result added successfully", "result": result_data}
+
+@app.post("/api/results/bulk")
+async def bulk_import_results(request: Request, upload_format: Optional[str] = Query(None, alias="format"),
+                              current_user: dict = Depends(get_current_user)):
+    """Import results from a streamed CSV (with a header row) or NDJSON body
+    of ResultInput rows. Invalid rows are reported without aborting the batch."""
+    if current_user["role"] not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    upload_format = upload_format or BULK_UPLOAD_FORMATS.get(content_type)
+    if upload_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=415, detail="Upload must be text/csv or application/x-ndjson")
+    
+    known_students = set()
+    async for user in users_collection.find({}, {"_id": 0, "student_id": 1}):
+        known_students.add(user["student_id"])
+    
+    archived_years = set(await archived_years_collection.distinct("year"))
+    importer = BulkResultImport(known_students, await subject_catalogue.all(), archived_years, BULK_WRITE_CHUNK_SIZE)
+    async for line_number, row in iter_upload_rows(request, upload_format):
+        await importer.add(line_number, row)
+    await importer.flush()
+    
+    # Bulk upserts have no pre-images, so recompute the affected summaries
+    touched_students = sorted(importer.touched_students)
+    for start in range(0, len(touched_students), BULK_WRITE_CHUNK_SIZE):
+        await rebuild_student_summaries(touched_students[start:start + BULK_WRITE_CHUNK_SIZE])
+    await bump_versions([student_version_key(student_id) for student_id in touched_students])
+    
+    if importer.watched_results:
+        summaries = student_summaries_collection.find(
+            {"student_id": {"$in": list(importer.watched_results)}}, {"_id": 0}
+        )
+        async for summary in summaries:
+            result_broker.publish(summary["student_id"], importer.watched_results[summary["student_id"]], summary)
+    
+    return {"message": "Bulk import completed", **importer.report()}
+
+@app.get("/api/results/stream")
+async def stream_results(student_id: Optional[str] = None, subject_id: Optional[str] = None,
+                         current_user: dict = Depends(get_stream_user)):
+    """Server-sent events with each new or changed result for a student (or,
+    for teachers and admins, a subject) and the student's updated GPAs.
+    Fetch the transcript once, then apply these deltas to it."""
+    if (student_id is None) == (subject_id is None):
+        raise HTTPException(status_code=400, detail="Subscribe to exactly one of student_id or subject_id")
+    if current_user["role"] == "student" and current_user["student_id"] != student_id:
+        raise HTTPException(status_code=403, detail="Can only subscribe to your own results")
+    
+    topic = f"student:{student_id}" if student_id is not None else f"subject:{subject_id}"
+    return StreamingResponse(
+        stream_result_events([topic], RESULT_STREAM_KEEPALIVE),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/api/results/student/{student_id}")
-def get_student_results(student_id: str, current_user: dict = Depends(get_current_user)):
+async def get_student_results(student_id: str, request: Request, current_user: dict = Depends(get_current_user)):
     # Students can only view their own results, admin/teachers can view any
     if current_user["role"] == "student" and current_user["student_id"] != student_id:
         raise HTTPException(status_code=403, detail="Can only view your own results")
     
+    # Subject credits feed into the GPAs, so the subjects version is part of the tag
+    student_key = student_version_key(student_id)
+    versions = await read_versions(student_key, SUBJECTS_VERSION)
+    etag = f'"transcript-{student_id}-{versions[student_key]}-{versions[SUBJECTS_VERSION]}"'
+    if if_none_match(request, etag):
+        return not_modified(etag, TRANSCRIPT_CACHE_CONTROL)
+    
     # Get student info
-    student = users_collection.find_one({"student_id": student_id}, {"_id": 0, "password": 0})
+    student = await users_collection.find_one({"student_id": student_id}, {"_id": 0, "password": 0})
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    # Get all results for student
-    results = list(results_collection.find({"student_id": student_id}, {"_id": 0}))
+    transcript = await read_transcript(student_id)
     
-    # Group results by semester and year
-    grouped_results = {}
-    for result in results:
-        key = f"{result['year']}-{result['semester']}"
-        if key not in grouped_results:
-            grouped_results[key] = []
-        grouped_results[key].append(result)
+    return FastJSONResponse(
+        {"student": student, **transcript},
+        headers={"ETag": etag, "Cache-Control": TRANSCRIPT_CACHE_CONTROL}
+    )
+
+@app.post("/api/results/transcripts")
+async def get_student_transcripts(batch: TranscriptBatchRequest, current_user: dict = Depends(get_current_user)):
+    """Transcripts for a list of students, or for every student with a result
+    matching the subject/semester/year filter, in a handful of queries"""
+    if current_user["role"] not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
     
-    # Calculate GPA for each semester and overall
-    semester_gpas = {}
-    all_results = []
+    if batch.student_ids is not None:
+        student_ids = list(dict.fromkeys(batch.student_ids))
+    else:
+        result_filter = {
+            field: value for field, value in
+            (("subject_id", batch.subject_id), ("semester", batch.semester), ("year", batch.year))
+            if value is not None
+        }
+        if not result_filter:
+            raise HTTPException(status_code=400, detail="Provide student_ids or a subject_id, semester or year filter")
+        matching = await results_collection.aggregate([
+            {"$match": result_filter},
+            union_archived_results(result_filter),
+            {"$group": {"_id": "$student_id"}}
+        ]).to_list(length=None)
+        student_ids = sorted(row["_id"] for row in matching)
+    if len(student_ids) > TRANSCRIPT_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {TRANSCRIPT_BATCH_MAX} students per request")
     
-    for key, semester_results in grouped_results.items():
-        semester_gpa = calculate_gpa(semester_results)
-        semester_gpas[key] = semester_gpa
-        all_results.extend(semester_results)
+    students = await users_collection.find(
+        {"student_id": {"$in": student_ids}}, {"_id": 0, "password": 0}
+    ).to_list(length=None)
+    students = {student["student_id"]: student for student in students}
+    found = [student_id for student_id in student_ids if student_id in students]
+    transcripts = await read_transcripts(found) if found else {}
     
-    overall_gpa = calculate_gpa(all_results)
+    return FastJSONResponse({
+        "transcripts": [
+            {"student": students[student_id], **transcripts[student_id]} for student_id in found
+        ],
+        "not_found": [student_id for student_id in student_ids if student_id not in students]
+    })
+
+@app.get("/api/results/student/{student_id}/summary")
+async def get_student_summary(student_id: str, current_user: dict = Depends(get_current_user)):
+    if current_user["role"] == "student" and current_user["student_id"] != student_id:
+        raise HTTPException(status_code=403, detail="Can only view your own results")
     
-    return {
-        "student": student,
-        "results_by_semester": grouped_results,
-        "semester_gpas": semester_gpas,
-        "overall_gpa": overall_gpa,
-        "total_subjects": len(all_results)
-    }
+    summary = await student_summaries_collection.find_one({"student_id": student_id}, {"_id": 0})
+    if summary is None:
+        transcript = await build_transcript(student_id)
+        transcript.pop("results_by_semester")
+        return {"student_id": student_id, **transcript}
+    
+    return {"student_id": student_id, **gpas_from_summary(summary)}
 
 @app.get("/api/results/summary")
-def get_results_summary(current_user: dict = Depends(get_current_user)):
+async def get_results_summary(current_user: dict = Depends(get_current_user)):
     if current_user["role"] not in ["admin"]:
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    total_students = users_collection.count_documents({"role": "student"})
-    total_subjects = subjects_collection.count_documents({})
-    total_results = results_collection.count_documents({})
+    return await results_analytics.get()
+
+@app.post("/api/results/summary/refresh")
+async def refresh_results_summary(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
     
-    return {
-        "total_students": total_students,
-        "total_subjects": total_subjects,
-        "total_results": total_results
-    }
+    return await results_analytics.refresh()
+
+@app.get("/api/rankings/top")
+async def get_top_students(limit: int = Query(10, ge=1, le=1000),
+                           year: Optional[str] = None, semester: Optional[str] = None,
+                           current_user: dict = Depends(get_current_user)):
+    if current_user["role"] not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    scope = rank_scope(year, semester)
+    rankings = rank_index.top(scope, limit)
+    names = {}
+    if rankings:
+        async for user in users_collection.find(
+            {"student_id": {"$in": [entry["student_id"] for entry in rankings]}},
+            {"_id": 0, "student_id": 1, "name": 1}
+        ):
+            names[user["student_id"]] = user["name"]
+    for entry in rankings:
+        entry["name"] = names.get(entry["student_id"])
+    
+    return {"scope": scope, "cohort_size": rank_index.cohort_size(scope), "rankings": rankings}
+
+@app.get("/api/rankings/student/{student_id}")
+async def get_student_rank(student_id: str, year: Optional[str] = None, semester: Optional[str] = None,
+                           current_user: dict = Depends(get_current_user)):
+    if current_user["role"] == "student" and current_user["student_id"] != student_id:
+        raise HTTPException(status_code=403, detail="Can only view your own results")
+    
+    scope = rank_scope(year, semester)
+    ranking = rank_index.student_rank(scope, student_id)
+    if ranking is None:
+        raise HTTPException(status_code=404, detail="No ranked results for this student")
+    return {"scope": scope, **ranking}
+
+@app.get("/api/exports/results")
+async def export_results(export_format: str = Query("csv", alias="format"),
+                         cohort: Optional[str] = None,
+                         year: Optional[str] = None,
+                         semester: Optional[str] = None,
+                         current_user: dict = Depends(get_current_user)):
+    """Stream every result matching the cohort (student_id prefix), year and
+    semester filters as CSV, NDJSON or Parquet, with grade and GPA columns"""
+    if current_user["role"] not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    if export_format not in EXPORT_ENCODERS:
+        raise HTTPException(status_code=400, detail="Format must be csv, ndjson or parquet")
+    if export_format == "parquet" and pyarrow is None:
+        raise HTTPException(status_code=501, detail="Parquet exports require pyarrow")
+    
+    name = "-".join(part for part in ["results", cohort, year, semester] if part)
+    filename = re.sub(r"[^A-Za-z0-9_.-]", "_", name) + "." + export_format
+    batches = iter_export_batches(export_filter(cohort, year, semester), EXPORT_BATCH_SIZE)
+    return StreamingResponse(
+        EXPORT_ENCODERS[export_format](batches),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/api/students/search")
+async def search_students(q: str = Query(..., min_length=1),
+                          limit: int = Query(STUDENT_SEARCH_LIMIT, ge=1, le=STUDENT_SEARCH_LIMIT_MAX),
+                          current_user: dict = Depends(get_current_user)):
+    """Typeahead: students whose student_id, name or email starts with q,
+    then fuzzy (trigram) matches, from memory when the index is built"""
+    if current_user["role"] not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    if student_search_index.ready:
+        return FastJSONResponse({"students": student_search_index.search(q, limit), "source": "index"})
+    return FastJSONResponse({"students": await search_students_in_database(q, limit), "source": "database"})
 
 @app.get("/api/students")
-def get_all_students(current_user: dict = Depends(get_current_user)):
+async def get_all_students(request: Request,
+                           limit: Optional[int] = Query(None, ge=1, le=STUDENT_PAGE_SIZE_MAX),
+                           cursor: Optional[str] = None,
+                           q: Optional[str] = None,
+                           current_user: dict = Depends(get_current_user)):
+    """Students ordered by student_id, one page at a time. Pass the returned
+    next_cursor to get the following page. With `Accept: application/x-ndjson`
+    matching students are streamed instead (all of them unless limit is set)."""
     if current_user["role"] not in ["admin", "teacher"]:
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    students = list(users_collection.find(
-        {"role": "student"}, 
-        {"_id": 0, "password": 0}
-    ))
-    return {"students": students}
+    query = {"role": "student"}
+    if cursor:
+        query["student_id"] = {"$gt": decode_cursor(cursor)}
+    if q:
+        prefix = "^" + re.escape(q)
+        query["$or"] = [
+            {"student_id": {"$regex": prefix}},
+            {"name": {"$regex": prefix, "$options": "i"}},
+            {"email": {"$regex": prefix, "$options": "i"}}
+        ]
+    
+    students_cursor = users_collection.find(query, {"_id": 0, "password": 0}).sort("student_id", pymongo.ASCENDING)
+    
+    if wants_ndjson(request):
+        if limit:
+            students_cursor = students_cursor.limit(limit)
+        return StreamingResponse(stream_ndjson(students_cursor.batch_size(1000)), media_type=NDJSON_MEDIA_TYPE)
+    
+    # Fetch one extra student to know whether another page exists
+    page_size = limit or STUDENT_PAGE_SIZE
+    students = await students_cursor.limit(page_size + 1).to_list(length=None)
+    next_cursor = None
+    if len(students) > page_size:
+        students = students[:page_size]
+        next_cursor = encode_cursor(students[-1]["student_id"])
+    return FastJSONResponse({"students": students, "next_cursor": next_cursor})
 
 if __name__ == "__main__":
     import uvicorn
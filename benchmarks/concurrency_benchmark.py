@@ -0,0 +1,142 @@
+"""Concurrent-request throughput benchmark for the Student Result API.
+
+Fires a fixed number of authenticated requests at a running server with a
+pool of concurrent clients and reports requests/second plus latency
+percentiles per endpoint. To compare the blocking pymongo build against the
+async Motor build, start each version of ``backend/server.py`` in turn and
+run this script against both with the same settings, e.g.:
+
+    python benchmarks/concurrency_benchmark.py --base-url http://localhost:8001 \
+        --concurrency 64 --requests 2000 --output before.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class ThroughputBenchmark:
+    def __init__(self, base_url, concurrency, total_requests):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.total_requests = total_requests
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency, pool_connections=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.token = None
+        self.student_id = None
+
+    def seed(self):
+        """Register a throwaway admin, one subject and one result to read back"""
+        suffix = uuid.uuid4().hex[:8].upper()
+        self.student_id = f"BENCH{suffix}"
+        password = "bench-password"
+        self.session.post(f"{self.base_url}/api/auth/register", json={
+            "student_id": self.student_id,
+            "name": "Benchmark Admin",
+            "email": f"{self.student_id.lower()}@bench.local",
+            "role": "admin",
+            "password": password,
+        }).raise_for_status()
+        response = self.session.post(f"{self.base_url}/api/auth/login", json={
+            "student_id": self.student_id,
+            "password": password,
+        })
+        response.raise_for_status()
+        self.token = response.json()["access_token"]
+
+        response = self.session.post(f"{self.base_url}/api/subjects", headers=self.headers, json={
+            "name": "Benchmark Subject",
+            "code": f"BEN{suffix}",
+            "credits": 3,
+        })
+        response.raise_for_status()
+        subject_id = response.json()["subject"]["id"]
+        self.session.post(f"{self.base_url}/api/results", headers=self.headers, json={
+            "student_id": self.student_id,
+            "subject_id": subject_id,
+            "marks": 84,
+            "semester": "Fall",
+            "year": "2024",
+        }).raise_for_status()
+
+    @property
+    def headers(self):
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def timed_get(self, path):
+        start = time.perf_counter()
+        response = self.session.get(f"{self.base_url}{path}", headers=self.headers)
+        return time.perf_counter() - start, response.status_code
+
+    def run_endpoint(self, name, path):
+        latencies = []
+        errors = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for latency, status_code in executor.map(lambda _: self.timed_get(path), range(self.total_requests)):
+                latencies.append(latency)
+                if status_code != 200:
+                    errors += 1
+        elapsed = time.perf_counter() - start
+        return {
+            "endpoint": name,
+            "requests": self.total_requests,
+            "concurrency": self.concurrency,
+            "errors": errors,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(self.total_requests / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        }
+
+    def run(self):
+        self.seed()
+        endpoints = [
+            ("auth_me", "/api/auth/me"),
+            ("subjects", "/api/subjects"),
+            ("student_results", f"/api/results/student/{self.student_id}"),
+        ]
+        return [self.run_endpoint(name, path) for name, path in endpoints]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    benchmark = ThroughputBenchmark(args.base_url, args.concurrency, args.requests)
+    report = benchmark.run()
+
+    print(f"{'endpoint':<18}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for row in report:
+        print(f"{row['endpoint']:<18}{row['throughput_rps']:>10}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['errors']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"base_url": args.base_url, "results": report}, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
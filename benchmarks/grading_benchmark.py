@@ -0,0 +1,59 @@
+"""Micro-benchmark of the scalar grader against the vectorized batch grader.
+
+Grades the same random marks with calculate_grade in a Python loop and with
+one calculate_grades call, checks that both agree row for row and prints
+the timings:
+
+    python benchmarks/grading_benchmark.py --rows 500000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from server import calculate_grade, calculate_grades  # noqa: E402
+
+
+def best_of(repeats, function):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    max_marks = rng.choice([50.0, 75.0, 100.0], size=args.rows)
+    marks = np.round(rng.uniform(0, 1, size=args.rows) * max_marks, 1)
+    marks_list, max_marks_list = marks.tolist(), max_marks.tolist()
+
+    scalar_time, scalar_grades = best_of(args.repeats, lambda: [
+        calculate_grade(mark, maximum) for mark, maximum in zip(marks_list, max_marks_list)
+    ])
+    batch_time, (batch_grades, _) = best_of(args.repeats, lambda: calculate_grades(marks, max_marks))
+
+    if scalar_grades != batch_grades.tolist():
+        print("Scalar and batch grades differ", file=sys.stderr)
+        return 1
+
+    print(f"rows:    {args.rows}")
+    print(f"scalar:  {scalar_time * 1000:10.1f} ms  ({args.rows / scalar_time:,.0f} rows/s)")
+    print(f"batch:   {batch_time * 1000:10.1f} ms  ({args.rows / batch_time:,.0f} rows/s)")
+    print(f"speedup: {scalar_time / batch_time:10.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""Reproducible load test for the Student Result API.
+
+Seeds a synthetic institution (students x subjects x semesters) through the
+API, then drives concurrent workloads against it -- a login storm,
+transcript reads, bulk result entry and admin roster listing -- and reports
+throughput and p50/p95/p99 latency per workload. The same --seed produces
+the same institution and the same request mix, so JSON reports from two
+runs can be compared for regressions.
+
+Without --base-url the API is started in-process on a free port against a
+throwaway database on MONGO_URL (a local mongod by default), which is
+dropped afterwards:
+
+    python benchmarks/load_benchmark.py --students 500 --subjects 8 --semesters 4 \
+        --concurrency 32 --requests 1000 --output run.json
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from concurrency_benchmark import percentile
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+PASSWORD = "bench-password"
+SEMESTERS = ["Spring", "Fall"]
+
+
+class InProcessServer:
+    """Runs backend/server.py under uvicorn in a background thread"""
+
+    def __init__(self, db_name):
+        os.environ["DB_NAME"] = db_name
+        sys.path.insert(0, BACKEND_DIR)
+        import uvicorn
+        import server
+
+        self.db_name = db_name
+        self.mongo_url = server.MONGO_URL
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("In-process server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
+        from pymongo import MongoClient
+        MongoClient(self.mongo_url).drop_database(self.db_name)
+
+
+class Institution:
+    """Deterministic synthetic students, subjects and marks for one seed"""
+
+    def __init__(self, students, subjects, semesters, seed):
+        self.rng = random.Random(seed)
+        # Ids are unique per run so repeated runs can share a database
+        self.prefix = f"LD{uuid.uuid4().hex[:6].upper()}"
+        self.student_ids = [f"{self.prefix}S{index:05d}" for index in range(students)]
+        self.subject_codes = [f"{self.prefix}C{index:03d}" for index in range(subjects)]
+        self.terms = [(str(2020 + index // len(SEMESTERS)), SEMESTERS[index % len(SEMESTERS)])
+                      for index in range(semesters)]
+        self.admin_id = f"{self.prefix}ADMIN"
+
+    def marks(self):
+        return round(min(100.0, max(0.0, self.rng.gauss(68, 14))), 1)
+
+    def result_rows(self, student_id, subject_ids, terms):
+        return [(student_id, subject_id, self.marks(), semester, year)
+                for year, semester in terms for subject_id in subject_ids]
+
+
+def results_csv(rows):
+    lines = ["student_id,subject_id,marks,semester,year"]
+    lines.extend(",".join(str(value) for value in row) for row in rows)
+    return "\n".join(lines).encode()
+
+
+class LoadBenchmark:
+    def __init__(self, base_url, institution, concurrency, total_requests):
+        self.base_url = base_url.rstrip("/")
+        self.institution = institution
+        self.concurrency = concurrency
+        self.total_requests = total_requests
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency, pool_connections=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.token = None
+        self.subject_ids = []
+
+    @property
+    def headers(self):
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def register(self, student_id, role):
+        self.session.post(f"{self.base_url}/api/auth/register", json={
+            "student_id": student_id,
+            "name": f"Load {student_id}",
+            "email": f"{student_id.lower()}@load.local",
+            "role": role,
+            "password": PASSWORD,
+        }).raise_for_status()
+
+    def bulk_results(self, rows):
+        response = self.session.post(f"{self.base_url}/api/results/bulk", headers={
+            **self.headers, "Content-Type": "text/csv",
+        }, data=results_csv(rows))
+        response.raise_for_status()
+        return response
+
+    def seed(self):
+        """Register the admin, subjects and students, then import every result"""
+        institution = self.institution
+        start = time.perf_counter()
+        self.register(institution.admin_id, "admin")
+        response = self.session.post(f"{self.base_url}/api/auth/login", json={
+            "student_id": institution.admin_id, "password": PASSWORD,
+        })
+        response.raise_for_status()
+        self.token = response.json()["access_token"]
+
+        for code in institution.subject_codes:
+            response = self.session.post(f"{self.base_url}/api/subjects", headers=self.headers, json={
+                "name": f"Subject {code}", "code": code, "credits": institution.rng.choice([2, 3, 4]),
+            })
+            response.raise_for_status()
+            self.subject_ids.append(response.json()["subject"]["id"])
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(lambda student_id: self.register(student_id, "student"), institution.student_ids))
+
+        rows = []
+        for student_id in institution.student_ids:
+            rows.extend(institution.result_rows(student_id, self.subject_ids, institution.terms))
+        for offset in range(0, len(rows), 5000):
+            self.bulk_results(rows[offset:offset + 5000])
+        return {
+            "students": len(institution.student_ids),
+            "subjects": len(self.subject_ids),
+            "semesters": len(institution.terms),
+            "results": len(rows),
+            "seed_s": round(time.perf_counter() - start, 3),
+        }
+
+    def workloads(self):
+        """(name, list of zero-argument request callables) with a fixed request mix"""
+        institution = self.institution
+        rng = institution.rng
+        count = self.total_requests
+        students = [rng.choice(institution.student_ids) for _ in range(count)]
+        # Bulk entry posts one student's marks for a new term per request
+        entry_terms = [(str(2100 + index // len(SEMESTERS)), SEMESTERS[index % len(SEMESTERS)])
+                       for index in range(count)]
+        entries = [institution.result_rows(rng.choice(institution.student_ids), self.subject_ids, [term])
+                   for term in entry_terms]
+        prefixes = [student_id[:len(institution.prefix) + 3] for student_id in students]
+
+        def login(student_id):
+            return lambda: self.session.post(f"{self.base_url}/api/auth/login", json={
+                "student_id": student_id, "password": PASSWORD,
+            })
+
+        def transcript(student_id):
+            return lambda: self.session.get(f"{self.base_url}/api/results/student/{student_id}",
+                                            headers=self.headers)
+
+        def bulk_entry(rows):
+            return lambda: self.session.post(f"{self.base_url}/api/results/bulk", headers={
+                **self.headers, "Content-Type": "text/csv",
+            }, data=results_csv(rows))
+
+        def roster(prefix):
+            return lambda: self.session.get(f"{self.base_url}/api/students", headers=self.headers,
+                                            params={"q": prefix, "limit": 100})
+
+        return [
+            ("login_storm", [login(student_id) for student_id in students]),
+            ("transcript_reads", [transcript(student_id) for student_id in students]),
+            ("bulk_result_entry", [bulk_entry(rows) for rows in entries]),
+            ("roster_listing", [roster(prefix) for prefix in prefixes]),
+        ]
+
+    @staticmethod
+    def timed(call):
+        start = time.perf_counter()
+        response = call()
+        return time.perf_counter() - start, response.status_code
+
+    def run_workload(self, name, calls):
+        latencies = []
+        errors = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for latency, status_code in executor.map(self.timed, calls):
+                latencies.append(latency)
+                if status_code != 200:
+                    errors += 1
+        elapsed = time.perf_counter() - start
+        return {
+            "workload": name,
+            "requests": len(calls),
+            "concurrency": self.concurrency,
+            "errors": errors,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(calls) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        }
+
+    def run(self, selected):
+        seeded = self.seed()
+        results = [self.run_workload(name, calls) for name, calls in self.workloads()
+                   if not selected or name in selected]
+        return seeded, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="Benchmark a running server instead of starting one in-process")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--subjects", type=int, default=8)
+    parser.add_argument("--semesters", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per workload")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workload", action="append",
+                        choices=["login_storm", "transcript_reads", "bulk_result_entry", "roster_listing"],
+                        help="Run only these workloads (repeatable)")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    institution = Institution(args.students, args.subjects, args.semesters, args.seed)
+    if args.base_url:
+        benchmark = LoadBenchmark(args.base_url, institution, args.concurrency, args.requests)
+        seeded, report = benchmark.run(args.workload)
+    else:
+        with InProcessServer(f"load_benchmark_{uuid.uuid4().hex[:8]}") as server:
+            benchmark = LoadBenchmark(server.base_url, institution, args.concurrency, args.requests)
+            seeded, report = benchmark.run(args.workload)
+
+    print(f"seeded {seeded['students']} students, {seeded['subjects']} subjects, "
+          f"{seeded['results']} results in {seeded['seed_s']}s")
+    print(f"{'workload':<20}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for row in report:
+        print(f"{row['workload']:<20}{row['throughput_rps']:>10}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['errors']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({
+                "base_url": args.base_url or "in-process",
+                "settings": {key: value for key, value in vars(args).items() if key != "output"},
+                "seeded": seeded,
+                "results": report,
+            }, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Serialization and wire-size benchmark for /api/students responses.
+
+Builds synthetic roster pages shaped like the /api/students response and
+compares FastAPI's default path (jsonable_encoder + JSONResponse) with
+FastJSONResponse (orjson), then reports the bytes on the wire uncompressed,
+gzipped and brotli-compressed at the server's default levels:
+
+    python benchmarks/serialization_benchmark.py --sizes 1000 10000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from server import BROTLI_QUALITY, GZIP_LEVEL, FastJSONResponse, brotli  # noqa: E402
+
+
+def roster(size):
+    created = datetime(2024, 1, 1, 8, 30)
+    return {
+        "students": [
+            {
+                "id": str(uuid.uuid4()),
+                "student_id": f"ST{index:06d}",
+                "name": f"Student {index}",
+                "email": f"student{index}@example.edu",
+                "role": "student",
+                "created_at": created + timedelta(seconds=index, microseconds=index % 1000),
+            }
+            for index in range(size)
+        ],
+        "next_cursor": None,
+    }
+
+
+def best_of(repeats, function):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), output
+
+
+def gzip_size(body):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return len(compressor.compress(body) + compressor.flush())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'students':>9}{'default ms':>12}{'orjson ms':>11}{'speedup':>9}"
+          f"{'raw bytes':>12}{'gzip bytes':>12}{'br bytes':>11}")
+    for size in args.sizes:
+        content = roster(size)
+        default_time, default_body = best_of(
+            args.repeats, lambda: JSONResponse(jsonable_encoder(content)).body
+        )
+        fast_time, fast_body = best_of(args.repeats, lambda: FastJSONResponse(content).body)
+        br_size = len(brotli.compress(fast_body, quality=BROTLI_QUALITY)) if brotli else "n/a"
+        print(f"{size:>9}{default_time * 1000:>12.1f}{fast_time * 1000:>11.1f}"
+              f"{default_time / fast_time:>8.1f}x{len(fast_body):>12}{gzip_size(fast_body):>12}{br_size:>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
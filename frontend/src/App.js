@@ -12,6 +12,22 @@ import './App.css';
 
 const API_BASE_URL = process.env.REACT_APP_BACKEND_URL;
 
+// Merge an event from /api/results/stream into a fetched transcript
+const applyResultsDelta = (transcript, delta) => {
+  const resultsBySemester = { ...transcript.results_by_semester };
+  delta.results.forEach((result) => {
+    const key = `${result.year}-${result.semester}`;
+    const semesterResults = (resultsBySemester[key] || []).filter(
+      (existing) => existing.subject_id !== result.subject_id
+    );
+    resultsBySemester[key] = [...semesterResults, result];
+  });
+  const gpas = delta.semester_gpas
+    ? { semester_gpas: delta.semester_gpas, overall_gpa: delta.overall_gpa, total_subjects: delta.total_subjects }
+    : {};
+  return { ...transcript, ...gpas, results_by_semester: resultsBySemester };
+};
+
 function App() {
   const [user, setUser] = useState(null);
   const [token, setToken] = useState(localStorage.getItem('token'));
@@ -34,6 +50,7 @@ function App() {
   const [results, setResults] = useState(null);
   const [subjects, setSubjects] = useState([]);
   const [students, setStudents] = useState([]);
+  const [studentQuery, setStudentQuery] = useState('');
   const [newResult, setNewResult] = useState({
     student_id: '',
     subject_id: '',
@@ -53,12 +70,49 @@ function App() {
       fetchSubjects();
       if (user.role === 'student') {
         fetchStudentResults(user.student_id);
-      } else if (user.role === 'admin') {
-        fetchStudents();
       }
     }
   }, [user]);
 
+  // The student picker searches as the admin types instead of loading the roster
+  useEffect(() => {
+    if (!user || user.role !== 'admin' || !studentQuery.trim()) {
+      setStudents([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      const students = await searchStudents(studentQuery.trim());
+      if (!cancelled) setStudents(students);
+    }, 250);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [studentQuery, user]);
+
+  // Students get new grades pushed instead of refetching the transcript
+  useEffect(() => {
+    if (!user || user.role !== 'student' || !token) {
+      return undefined;
+    }
+    const params = new URLSearchParams({ student_id: user.student_id, access_token: token });
+    const source = new EventSource(`${API_BASE_URL}/api/results/stream?${params}`);
+    let reconnecting = false;
+    source.onopen = () => {
+      // Events published while the stream was down are not replayed
+      if (reconnecting) {
+        fetchStudentResults(user.student_id);
+      }
+      reconnecting = true;
+    };
+    source.addEventListener('results', (event) => {
+      const delta = JSON.parse(event.data);
+      setResults((current) => (current ? applyResultsDelta(current, delta) : current));
+    });
+    return () => source.close();
+  }, [user, token]);
+
   const showMessage = (message, type = 'error') => {
     if (type === 'error') {
       setError(message);
@@ -108,9 +162,10 @@ function App() {
     }
   };
 
-  const fetchStudents = async () => {
+  const searchStudents = async (query) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/students`, {
+      const params = new URLSearchParams({ q: query, limit: '20' });
+      const response = await fetch(`${API_BASE_URL}/api/students/search?${params}`, {
         headers: {
           'Authorization': `Bearer ${token}`,
           'Content-Type': 'application/json'
@@ -118,11 +173,12 @@ function App() {
       });
       if (response.ok) {
         const data = await response.json();
-        setStudents(data.students);
+        return data.students;
       }
     } catch (error) {
-      console.error('Error fetching students:', error);
+      console.error('Error searching students:', error);
     }
+    return [];
   };
 
   const fetchStudentResults = async (studentId) => {
@@ -225,7 +281,7 @@ function App() {
       if (response.ok) {
         showMessage('Result added successfully!', 'success');
         setNewResult({ student_id: '', subject_id: '', marks: '', semester: '', year: '' });
-        fetchStudentResults(newResult.student_id);
+        setStudentQuery('');
       } else {
         showMessage(data.detail || 'Failed to add result');
       }
@@ -507,7 +563,18 @@ function App() {
                 <form onSubmit={handleAddResult} className="space-y-4">
                   <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
                     <div>
-                      <Label htmlFor="student_select">Student</Label>
+                      <Label htmlFor="student_search">Student</Label>
+                      <Input
+                        id="student_search"
+                        type="text"
+                        placeholder="Search by name, ID or email"
+                        value={studentQuery}
+                        onChange={(e) => {
+                          setStudentQuery(e.target.value);
+                          setNewResult({...newResult, student_id: ''});
+                        }}
+                        className="mb-2"
+                      />
                       <select
                         id="student_select"
                         className="w-full p-2 border border-gray-300 rounded-md"
@@ -515,7 +582,7 @@ function App() {
                         onChange={(e) => setNewResult({...newResult, student_id: e.target.value})}
                         required
                       >
-                        <option value="">Select Student</option>
+                        <option value="">{studentQuery.trim() ? 'Select Student' : 'Search to find a student'}</option>
                         {students.map((student) => (
                           <option key={student.id} value={student.student_id}>
                             {student.name} ({student.student_id})
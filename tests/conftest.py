@@ -0,0 +1,71 @@
+"""Shared setup for the backend tests.
+
+Tests that need MongoDB use the ``database`` (or ``replica_set``) fixture and
+run against MONGO_URL (default localhost) in a throwaway database. They are
+skipped when no server is reachable, unless MONGO_REQUIRED is set, as it
+should be in CI, in which case they fail instead.
+"""
+import os
+import sys
+import uuid
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+MONGO_REQUIRED = os.environ.get("MONGO_REQUIRED", "false").lower() in ("1", "true", "yes")
+# server reads DB_NAME on import, so it has to be set before any test module imports it
+os.environ["DB_NAME"] = f"test_results_{uuid.uuid4().hex[:8]}"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import server  # noqa: E402
+
+
+def unavailable(reason):
+    if MONGO_REQUIRED:
+        pytest.fail(reason, pytrace=False)
+    pytest.skip(reason)
+
+
+@pytest.fixture(scope="session")
+def mongo_hello():
+    try:
+        return MongoClient(MONGO_URL, serverSelectionTimeoutMS=500).admin.command("hello")
+    except PyMongoError:
+        unavailable("MongoDB is not reachable")
+
+
+@pytest.fixture(scope="session")
+def replica_set(mongo_hello):
+    if "setName" not in mongo_hello:
+        unavailable("MongoDB is not running as a replica set")
+
+
+@pytest.fixture(scope="module")
+def database(mongo_hello):
+    """The test database, dropped after the module along with the server's
+    in-process caches so nothing carries over to the next module"""
+    client = MongoClient(MONGO_URL)
+    try:
+        yield client[server.DB_NAME]
+    finally:
+        client.drop_database(server.DB_NAME)
+        server.principal_cache.invalidate()
+        server.subject_catalogue.invalidate()
+        server.results_analytics.invalidate()
+
+
+@pytest.fixture(scope="session")
+def register_and_login():
+    def register_and_login(client, student_id, role):
+        client.post("/api/auth/register", json={
+            "student_id": student_id,
+            "name": student_id,
+            "email": f"{student_id.lower()}@example.com",
+            "role": role,
+            "password": "password",
+        })
+        response = client.post("/api/auth/login", json={"student_id": student_id, "password": "password"})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return register_and_login
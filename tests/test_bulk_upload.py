@@ -0,0 +1,48 @@
+"""Checks how uploaded CSV and NDJSON bodies are split into rows. No database needed."""
+import asyncio
+
+import server
+
+
+class UploadRequest:
+    """Stands in for a Request whose body arrives in `chunks`"""
+
+    def __init__(self, *chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def rows(upload_format, *chunks):
+    async def collect():
+        return [row async for row in server.iter_upload_rows(UploadRequest(*chunks), upload_format)]
+    return asyncio.run(collect())
+
+
+def test_csv_rows_survive_chunk_boundaries_and_crlf():
+    assert rows("csv", b"\xef\xbb\xbfstudent_id,marks,max_marks\r\nST1,5", b"0,\r\n\r\nST2,60,80") == [
+        (2, {"student_id": "ST1", "marks": "50"}),
+        (4, {"student_id": "ST2", "marks": "60", "max_marks": "80"}),
+    ]
+
+
+def test_invalid_utf8_fails_only_its_line():
+    assert rows("csv", b"student_id,marks\nST\xff1,50\nST2,60\n") == [
+        (2, "Invalid UTF-8 at byte 2"),
+        (3, {"student_id": "ST2", "marks": "60"}),
+    ]
+
+
+def test_byte_order_mark_is_only_stripped_from_the_first_line():
+    assert rows("ndjson", b'\xef\xbb\xbf{"a": 1}\n\xef\xbb\xbf{"a": 2}\n') == [
+        (1, {"a": 1}),
+        (2, "Invalid JSON: Unexpected UTF-8 BOM (decode using utf-8-sig)"),
+    ]
+
+
+def test_ndjson_lines_must_be_objects():
+    result = rows("ndjson", b'{"a": 1}\n[1]\n{bad\n')
+    assert result[:2] == [(1, {"a": 1}), (2, "Each line must be a JSON object")]
+    assert result[2][0] == 3 and result[2][1].startswith("Invalid JSON")
@@ -0,0 +1,88 @@
+"""Checks that writes made outside this worker evict its in-process caches.
+
+Needs a MongoDB replica set (a single node started with ``mongod --replSet
+rs0`` and ``rs.initiate()`` is enough); see conftest.py. Writes go straight
+to the database to stand in for another worker; cache TTLs are raised so
+only the change stream can evict entries.
+"""
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+@pytest.fixture(scope="module")
+def api(replica_set, database):
+    ttls = server.subject_catalogue.ttl, server.principal_cache.ttl
+    server.subject_catalogue.ttl = 3600
+    server.principal_cache.ttl = 3600
+    try:
+        with TestClient(server.app) as client:
+            assert wait_for(lambda: server.cache_invalidation_bus.mode == "change_streams")
+            yield client, database
+    finally:
+        server.subject_catalogue.ttl, server.principal_cache.ttl = ttls
+
+
+def test_external_writes_evict_cached_subjects_and_principals(api):
+    client, database = api
+    client.post("/api/auth/register", json={
+        "student_id": "ADMIN_C",
+        "name": "Before",
+        "email": "admin_c@example.com",
+        "role": "admin",
+        "password": "password",
+    })
+    response = client.post("/api/auth/login", json={"student_id": "ADMIN_C", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    assert client.get("/api/auth/me", headers=headers).json()["name"] == "Before"
+    database.users.update_one({"student_id": "ADMIN_C"}, {"$set": {"name": "After"}})
+    assert wait_for(lambda: client.get("/api/auth/me", headers=headers).json()["name"] == "After")
+
+    assert client.portal.call(server.subject_catalogue.all) == {}
+    database.subjects.insert_one({"id": "external", "name": "External", "code": "EXT1", "credits": 2})
+    assert wait_for(lambda: "external" in client.portal.call(server.subject_catalogue.all))
+
+
+def test_stream_resumes_after_disconnect(api):
+    client, database = api
+    bus = server.cache_invalidation_bus
+    assert bus.resume_token is not None
+
+    client.portal.call(bus.stop)
+    client.portal.call(server.subject_catalogue.all)
+    # Written while no stream is open; resuming from the token must replay it
+    database.subjects.insert_one({"id": "missed", "name": "Missed", "code": "MIS1", "credits": 3})
+    client.portal.call(bus.start)
+    assert wait_for(lambda: "missed" in client.portal.call(server.subject_catalogue.all))
+
+
+def test_results_are_followed_only_while_streams_are_open(api):
+    client, database = api
+    bus = server.cache_invalidation_bus
+    assert not bus.following_results
+
+    subscription = client.portal.call(server.result_broker.subscribe, ["student:ST_F"])
+    try:
+        assert wait_for(lambda: bus.following_results and bus.mode == "change_streams")
+        # Written by "another worker", so only the change stream can deliver it
+        database.results.insert_one({
+            "id": "followed", "student_id": "ST_F", "subject_id": "any", "marks": 70, "max_marks": 100,
+            "grade": "B+", "semester": "Fall", "year": "2024",
+        })
+        assert wait_for(lambda: not subscription.queue.empty())
+    finally:
+        client.portal.call(server.result_broker.unsubscribe, subscription)
+    assert wait_for(lambda: not bus.following_results and bus.mode == "change_streams")
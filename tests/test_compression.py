@@ -0,0 +1,89 @@
+"""Checks Accept-Encoding negotiation and the compression middleware. No database needed."""
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+import server
+
+LARGE = "x" * 2000
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "br" if server.brotli is not None else "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("BR;Q=0.0,GZIP;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+])
+def test_negotiate_encoding(header, expected):
+    assert server.negotiate_encoding(header) == expected
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+    app.add_middleware(server.CompressionMiddleware, minimum_size=500, gzip_level=6, brotli_quality=4)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse(LARGE)
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for index in range(3):
+                yield f"line {index}\n".encode()
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/events")
+    async def events():
+        async def messages():
+            yield LARGE.encode()
+        return StreamingResponse(messages(), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def raw_get(client, path, encoding):
+    with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_small_responses_are_sent_as_is(client):
+    response, body = raw_get(client, "/small", "gzip")
+    assert "content-encoding" not in response.headers
+    assert body == b"tiny"
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_large_responses_are_compressed(client, encoding):
+    if encoding == "br" and server.brotli is None:
+        pytest.skip("brotli is not installed")
+    decompress = server.brotli.decompress if encoding == "br" else gzip.decompress
+    response, body = raw_get(client, "/large", encoding)
+    assert response.headers["content-encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) == len(body)
+    assert decompress(body) == LARGE.encode()
+
+
+def test_streamed_bodies_are_compressed_chunk_by_chunk(client):
+    response, body = raw_get(client, "/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(body) == b"line 0\nline 1\nline 2\n"
+
+
+def test_event_streams_are_never_compressed(client):
+    response, body = raw_get(client, "/events", "gzip, br")
+    assert "content-encoding" not in response.headers
+    assert body == LARGE.encode()
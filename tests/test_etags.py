@@ -0,0 +1,24 @@
+"""Checks If-None-Match matching for ETag responses. No database needed."""
+import pytest
+from starlette.requests import Request
+
+import server
+
+
+def request(if_none_match=None):
+    headers = [] if if_none_match is None else [(b"if-none-match", if_none_match.encode())]
+    return Request({"type": "http", "headers": headers})
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ("", False),
+    ('"v1"', True),
+    ('W/"v1"', True),
+    ('"v0", W/"v1" ', True),
+    ("*", True),
+    ('"v2"', False),
+    ("v1", False),
+])
+def test_if_none_match(header, matches):
+    assert server.if_none_match(request(header), '"v1"') is matches
@@ -0,0 +1,36 @@
+"""Checks that the scalar and vectorized graders agree. No database needed."""
+import numpy as np
+import pytest
+
+import server
+
+DEFAULT = server.GradingScale(1, server.GRADE_BOUNDARIES, server.GRADE_POINTS)
+CUSTOM = server.GradingScale(2, [(45, "P"), (75, "D")], {"P": 2.0, "D": 4.0, "F": 0.0})
+
+
+@pytest.mark.parametrize("scale", [DEFAULT, CUSTOM])
+@pytest.mark.parametrize("max_marks", [100, 50, 30, 7])
+def test_grades_matches_grade_row_for_row(scale, max_marks):
+    # Every tenth of a mark, so each boundary and both of its sides are covered
+    marks = np.round(np.arange(0, max_marks + 0.05, 0.1), 1)
+    grades, points = scale.grades(marks, max_marks)
+    expected = [scale.grade(mark, max_marks) for mark in marks.tolist()]
+    assert grades.tolist() == expected
+    assert points.tolist() == [scale.points(grade) for grade in expected]
+
+
+def test_grades_takes_max_marks_per_row():
+    grades, _ = DEFAULT.grades([40, 20, 89.9, 90], [100, 50, 100, 100])
+    assert grades.tolist() == ["C", "C", "A", "A+"]
+
+
+def test_grades_rejects_non_positive_max_marks():
+    with pytest.raises(ValueError):
+        DEFAULT.grades([10, 20], [100, 0])
+
+
+def test_document_round_trip():
+    scale = server.GradingScale.from_document(CUSTOM.to_document())
+    assert scale.to_document() == CUSTOM.to_document()
+    assert scale.grade(74.9) == "P"
+    assert scale.grade(44.9) == "F"
@@ -0,0 +1,19 @@
+"""Checks the opaque page cursors. No database needed."""
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+@pytest.mark.parametrize("key", ["ST001", "", "ünï/+=", "a" * 200])
+def test_cursor_round_trip(key):
+    cursor = server.encode_cursor(key)
+    assert cursor.isascii()
+    assert server.decode_cursor(cursor) == key
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24=", server.encode_cursor("x")[:-4], "W10="])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        server.decode_cursor(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,79 @@
+"""Keeps the Mongo commands per request within budget, as reported by the
+query profiler's X-Query-Count header.
+
+Needs MongoDB; see conftest.py. Raise a budget only together with the
+change that needs the extra round trip.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+# Student, archived year, result upsert, summary update, version bump
+ADD_RESULT_BUDGET = 5
+# Versions, student, GPA summary, grouped results
+TRANSCRIPT_BUDGET = 4
+PROFILE = {server.QUERY_PROFILE_HEADER: "1"}
+
+
+@pytest.fixture(scope="module")
+def api(database, register_and_login):
+    allow_header = server.QUERY_PROFILE_ALLOW_HEADER
+    server.QUERY_PROFILE_ALLOW_HEADER = True
+    try:
+        with TestClient(server.app) as client:
+            admin = register_and_login(client, "ADMIN_B", "admin")
+            register_and_login(client, "ST_BUDGET", "student")
+            subject_ids = [
+                client.post("/api/subjects", headers=admin, json={
+                    "name": f"Budget {index}", "code": f"BDG{index}", "credits": 3,
+                }).json()["subject"]["id"]
+                for index in range(8)
+            ]
+            yield client, admin, subject_ids
+    finally:
+        server.QUERY_PROFILE_ALLOW_HEADER = allow_header
+
+
+def add_result(client, headers, subject_id, year, marks=70):
+    response = client.post("/api/results", headers={**headers, **PROFILE}, json={
+        "student_id": "ST_BUDGET", "subject_id": subject_id, "marks": marks, "semester": "Fall", "year": year,
+    })
+    assert response.status_code == 200
+    return int(response.headers["X-Query-Count"])
+
+
+def transcript_count(client, headers):
+    response = client.get("/api/results/student/ST_BUDGET", headers={**headers, **PROFILE})
+    assert response.status_code == 200
+    return int(response.headers["X-Query-Count"])
+
+
+def test_add_result_and_transcript_stay_within_budget(api):
+    client, admin, subject_ids = api
+    # The first write builds the summary and loads the caches
+    add_result(client, admin, subject_ids[0], "2020")
+
+    few = [add_result(client, admin, subject_id, "2021") for subject_id in subject_ids]
+    few_transcript = transcript_count(client, admin)
+    for year in range(2022, 2030):
+        for subject_id in subject_ids:
+            add_result(client, admin, subject_id, str(year))
+    many = [add_result(client, admin, subject_id, "2021", marks=90) for subject_id in subject_ids]
+    many_transcript = transcript_count(client, admin)
+
+    assert max(few + many) <= ADD_RESULT_BUDGET, (few, many)
+    assert max(few_transcript, many_transcript) <= TRANSCRIPT_BUDGET, (few_transcript, many_transcript)
+    assert few_transcript == many_transcript
+
+
+def test_profile_header_is_ignored_unless_allowed(api):
+    client, admin, _ = api
+    server.QUERY_PROFILE_ALLOW_HEADER = False
+    try:
+        response = client.get("/api/results/student/ST_BUDGET", headers={**admin, **PROFILE})
+    finally:
+        server.QUERY_PROFILE_ALLOW_HEADER = True
+    assert response.status_code == 200
+    assert "X-Query-Count" not in response.headers
+    assert "Server-Timing" not in response.headers
@@ -0,0 +1,67 @@
+"""Checks rank lookups and updates of the in-memory RankIndex. No database needed."""
+import server
+
+
+def summary(student_id, semesters):
+    """A student summary with `semesters` as {(year, semester): (points, credits)}"""
+    return {
+        "student_id": student_id,
+        "semesters": {
+            server.summary_semester_field(year, semester): {
+                "year": year, "semester": semester, "points": points, "credits": credits,
+            }
+            for (year, semester), (points, credits) in semesters.items()
+        },
+        "total_points": sum(points for points, _ in semesters.values()),
+        "total_credits": sum(credits for _, credits in semesters.values()),
+        "total_subjects": len(semesters),
+    }
+
+
+def build(*summaries):
+    index = server.RankIndex(refresh_interval=600)
+    for student in summaries:
+        index.update_student(student)
+    return index
+
+
+def test_ties_share_a_competition_rank():
+    index = build(
+        summary("A", {("2024", "Fall"): (12.0, 3)}),
+        summary("B", {("2024", "Fall"): (9.0, 3)}),
+        summary("C", {("2024", "Fall"): (12.0, 3)}),
+        summary("D", {("2024", "Fall"): (6.9, 3)}),
+    )
+    assert [(entry["student_id"], entry["rank"]) for entry in index.top("overall", 10)] == \
+        [("A", 1), ("C", 1), ("B", 3), ("D", 4)]
+    assert index.student_rank("overall", "B") == {
+        "student_id": "B", "gpa": 3.0, "rank": 3, "cohort_size": 4, "percentile": 50.0,
+    }
+    assert index.student_rank("overall", "nobody") is None
+
+
+def test_scopes_follow_semesters():
+    index = build(
+        summary("A", {("2024", "Fall"): (12.0, 3), ("2024", "Spring"): (6.0, 3)}),
+        summary("B", {("2024", "Fall"): (9.0, 3)}),
+    )
+    assert index.cohort_size("2024-Fall") == 2
+    assert index.cohort_size("2024-Spring") == 1
+    assert index.student_rank("2024-Fall", "B")["rank"] == 2
+    assert index.student_rank("overall", "B")["rank"] == 1
+
+
+def test_updates_move_and_remove_students():
+    index = build(
+        summary("A", {("2024", "Fall"): (12.0, 3)}),
+        summary("B", {("2024", "Fall"): (9.0, 3)}),
+    )
+    # B improves and drops the Fall semester for Spring
+    index.update_student(summary("B", {("2025", "Spring"): (12.0, 3)}))
+    assert index.cohort_size("2024-Fall") == 1
+    assert index.student_rank("2025-Spring", "B")["rank"] == 1
+    assert index.student_rank("overall", "B")["rank"] == 1
+
+    index.remove_student("A")
+    assert index.cohort_size("overall") == 1
+    assert index.student_rank("2024-Fall", "A") is None
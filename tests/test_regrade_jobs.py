@@ -0,0 +1,152 @@
+"""Checks how regrade jobs are claimed, resumed and superseded.
+
+Needs MongoDB; see conftest.py. The background job runner is disabled;
+each test drives JobRunner instances directly, standing in for separate
+workers.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+class WorkerStopped(Exception):
+    pass
+
+
+@pytest.fixture()
+def api(database, register_and_login):
+    job_runner_enabled = server.JOB_RUNNER_ENABLED
+    server.JOB_RUNNER_ENABLED = False
+    try:
+        with TestClient(server.app) as client:
+            admin = register_and_login(client, "ADMIN_J", "admin")
+            subject = client.post("/api/subjects", headers=admin, json={
+                "name": "Jobs", "code": "JOB1", "credits": 3,
+            }).json()["subject"]["id"]
+            for index, marks in enumerate([35, 45, 55, 65, 75, 85, 95]):
+                student_id = f"ST_J{index}"
+                register_and_login(client, student_id, "student")
+                response = client.post("/api/results", headers=admin, json={
+                    "student_id": student_id, "subject_id": subject, "marks": marks,
+                    "semester": "Fall", "year": "2024",
+                })
+                assert response.status_code == 200
+            yield client, admin
+    finally:
+        server.JOB_RUNNER_ENABLED = job_runner_enabled
+        # Every test starts from the default scale
+        database.client.drop_database(database.name)
+
+
+def create_scale(client, admin, boundaries, grade_points):
+    response = client.post("/api/grading-scales", headers=admin, json={
+        "boundaries": [{"min_percentage": bound, "grade": grade} for bound, grade in boundaries],
+        "grade_points": grade_points,
+    })
+    assert response.status_code == 200
+    return response.json()["job"]["id"]
+
+
+def stored_summaries(client):
+    summaries = client.portal.call(
+        lambda: server.student_summaries_collection.find({}, {"_id": 0, "updated_at": 0}).to_list(length=None)
+    )
+    return sorted(summaries, key=lambda summary: summary["student_id"])
+
+
+def test_stale_job_is_claimed_by_another_worker_and_resumed(api):
+    client, admin = api
+    job_id = create_scale(client, admin, [(50, "P")], {"P": 2.0, "F": 0.0})
+
+    first = server.JobRunner(chunk_size=2, poll_interval=1, stale_after=3600)
+    job = client.portal.call(first.claim)
+    assert job["id"] == job_id
+
+    # The first worker stops after finishing two chunks
+    advance = first.advance
+    finished = []
+
+    async def stop_after_two_chunks(*args, **kwargs):
+        await advance(*args, **kwargs)
+        finished.append(args[1])
+        if len(finished) == 2:
+            raise WorkerStopped()
+
+    first.advance = stop_after_two_chunks
+    with pytest.raises(WorkerStopped):
+        client.portal.call(server.run_regrade_job, first, job)
+
+    # Still fresh, so nobody else may take it
+    second = server.JobRunner(chunk_size=2, poll_interval=1, stale_after=3600)
+    assert client.portal.call(second.claim) is None
+
+    second.stale_after = 0
+    resumed = client.portal.call(second.claim)
+    assert resumed["id"] == job_id
+    assert resumed["cursor"] == finished[-1]
+    assert resumed["progress"]["grades"]["processed"] == 4
+
+    client.portal.call(second.run, resumed)
+    job = client.get(f"/api/jobs/{job_id}", headers=admin).json()
+    assert job["status"] == "completed"
+    assert job["progress"]["grades"]["processed"] == 7
+    assert client.portal.call(server.results_collection.count_documents, {"scale_version": {"$ne": 2}}) == 0
+
+    # The first worker lost the job and cannot write to it any more
+    with pytest.raises(server.JobLost):
+        client.portal.call(lambda: first.save(resumed, status="failed"))
+
+
+def test_grades_written_behind_the_cursor_are_swept_up(api):
+    client, admin = api
+    job_id = create_scale(client, admin, [(50, "P")], {"P": 2.0, "F": 0.0})
+    runner = server.JobRunner(chunk_size=2, poll_interval=1, stale_after=3600)
+    job = client.portal.call(runner.claim)
+
+    # A worker still on the old scale rewrites a result the job already passed
+    advance = runner.advance
+
+    async def stale_write_after_first_chunk(*args, **kwargs):
+        await advance(*args, **kwargs)
+        if args[0]["progress"]["grades"]["processed"] == 2:
+            await server.results_collection.update_one(
+                {"_id": args[1]}, {"$set": {"grade": "A", "scale_version": 1}}
+            )
+
+    runner.advance = stale_write_after_first_chunk
+    client.portal.call(runner.run, job)
+    assert client.get(f"/api/jobs/{job_id}", headers=admin).json()["status"] == "completed"
+    assert client.portal.call(server.results_collection.count_documents, {"scale_version": {"$ne": 2}}) == 0
+
+
+def test_superseded_job_keeps_its_grade_point_change(api):
+    client, admin = api
+    # v2 changes grade points; v3 only moves a boundary before v2's job runs
+    old_job = create_scale(client, admin, [(50, "P"), (80, "D")], {"P": 2.0, "D": 4.0, "F": 0.0})
+    new_job = create_scale(client, admin, [(60, "P"), (80, "D")], {"P": 2.0, "D": 4.0, "F": 0.0})
+
+    runner = server.JobRunner(chunk_size=3, poll_interval=1, stale_after=3600)
+    job = client.portal.call(runner.claim)
+    assert job["id"] == old_job
+    client.portal.call(runner.run, job)
+    assert client.get(f"/api/jobs/{old_job}", headers=admin).json()["status"] == "superseded"
+
+    job = client.portal.call(runner.claim)
+    assert job["id"] == new_job
+    client.portal.call(runner.run, job)
+    job = client.get(f"/api/jobs/{new_job}", headers=admin).json()
+    assert job["status"] == "completed"
+    assert "summaries" in job["progress"]
+
+    summaries = stored_summaries(client)
+    client.portal.call(server.rebuild_student_summaries)
+    assert summaries == stored_summaries(client)
+
+    # A slower job for the older scale must not overwrite newer grades
+    older = client.portal.call(server.grading_scales.get, 2)
+    rows = client.portal.call(lambda: server.results_collection.find({}).to_list(length=None))
+    client.portal.call(server.regrade_results, older, rows)
+    after = client.portal.call(lambda: server.results_collection.find({}).to_list(length=None))
+    assert [(row["grade"], row["scale_version"]) for row in after] == \
+        [(row["grade"], row["scale_version"]) for row in rows]
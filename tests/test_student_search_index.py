@@ -0,0 +1,49 @@
+"""Checks prefix and fuzzy matching of the StudentSearchIndex. No database needed."""
+import pytest
+
+import server
+
+
+@pytest.fixture()
+def index():
+    index = server.StudentSearchIndex()
+    for student_id, name, email in [
+        ("ST001", "Alice Johnson", "alice.j@uni.edu"),
+        ("ST002", "Bob Stone", "bstone@uni.edu"),
+        ("ST010", "Alicia Keys", "akeys@uni.edu"),
+        ("ST100", "Carol Johnston", "carol@uni.edu"),
+    ]:
+        index.add({"id": student_id.lower(), "student_id": student_id, "name": name, "email": email, "role": "student"})
+    return index
+
+
+def student_ids(students):
+    return [student["student_id"] for student in students]
+
+
+def test_prefix_matches_ids_names_words_and_emails(index):
+    assert student_ids(index.search("ST00", 2)) == ["ST001", "ST002"]
+    assert student_ids(index.search("ali", 2)) == ["ST001", "ST010"]
+    assert student_ids(index.search("johns", 2)) == ["ST001", "ST100"]
+    assert student_ids(index.search("bstone", 1)) == ["ST002"]
+    assert student_ids(index.search("  CAROL ", 1)) == ["ST100"]
+
+
+def test_fuzzy_matches_top_up_prefix_ones(index):
+    # ST010 shares the "st0" trigram but does not start with "st00"
+    assert student_ids(index.search("st00", 10)) == ["ST001", "ST002", "ST010"]
+    # A typo still finds the student through shared trigrams
+    assert student_ids(index.search("johnsen", 10))[:1] == ["ST001"]
+    assert index.search("zzzz", 10) == []
+
+
+def test_changed_and_removed_students_are_reindexed(index):
+    index.add({"id": "st002", "student_id": "ST002", "name": "Robert Stone", "email": "rstone@uni.edu"})
+    assert student_ids(index.search("rob", 10)) == ["ST002"]
+    assert "ST002" not in student_ids(index.search("bst", 10))
+
+    index.add({"id": "st010", "student_id": "ST010", "name": "Alicia Keys", "email": "akeys@uni.edu", "role": "teacher"})
+    assert "ST010" not in student_ids(index.search("alicia", 10))
+
+    index.remove("ST001")
+    assert index.search("alice", 10) == []
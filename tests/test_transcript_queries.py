@@ -0,0 +1,89 @@
+"""Counts the Mongo commands issued per transcript request.
+
+Needs MongoDB; see conftest.py.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from pymongo import monitoring
+
+import server
+
+# Connection housekeeping that is not issued by the request handlers
+IGNORED_COMMANDS = {"hello", "isMaster", "ismaster", "ping", "endSessions", "saslStart", "saslContinue"}
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.database_name == server.DB_NAME and event.command_name not in IGNORED_COMMANDS:
+            self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+@pytest.fixture(scope="module")
+def api(database):
+    counter = CommandCounter()
+    server.mongo_event_listeners.append(counter)
+    try:
+        with TestClient(server.app) as client:
+            yield client, counter
+    finally:
+        server.mongo_event_listeners.remove(counter)
+
+
+def seed_results(client, headers, student_id, subject_ids, semesters):
+    for year, semester in semesters:
+        for subject_id in subject_ids:
+            response = client.post("/api/results", headers=headers, json={
+                "student_id": student_id,
+                "subject_id": subject_id,
+                "marks": 75,
+                "semester": semester,
+                "year": year,
+            })
+            assert response.status_code == 200
+
+
+def transcript_commands(client, counter, headers, student_id):
+    counter.commands.clear()
+    response = client.get(f"/api/results/student/{student_id}", headers=headers)
+    assert response.status_code == 200
+    return list(counter.commands), response.json()
+
+
+def test_transcript_query_count_does_not_grow_with_results(api, register_and_login):
+    client, counter = api
+    admin = register_and_login(client, "ADMIN_Q", "admin")
+    register_and_login(client, "ST_SMALL", "student")
+    register_and_login(client, "ST_LARGE", "student")
+
+    subject_ids = []
+    for index in range(10):
+        response = client.post("/api/subjects", headers=admin, json={
+            "name": f"Subject {index}", "code": f"QRY{index}", "credits": 3,
+        })
+        subject_ids.append(response.json()["subject"]["id"])
+
+    seed_results(client, admin, "ST_SMALL", subject_ids[:1], [("2024", "Fall")])
+    seed_results(client, admin, "ST_LARGE", subject_ids, [
+        ("2023", "Fall"), ("2023", "Spring"), ("2024", "Fall"), ("2024", "Spring"),
+    ])
+
+    # Warm up so both measured requests see the same cache state
+    transcript_commands(client, counter, admin, "ST_SMALL")
+
+    small_commands, small = transcript_commands(client, counter, admin, "ST_SMALL")
+    large_commands, large = transcript_commands(client, counter, admin, "ST_LARGE")
+
+    assert small["total_subjects"] == 1
+    assert large["total_subjects"] == 40
+    assert len(large_commands) == len(small_commands), (small_commands, large_commands)
+    # Current user, student, GPA summary and grouped results
+    assert len(large_commands) <= 4, large_commands